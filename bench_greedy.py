@@ -0,0 +1,80 @@
+import argparse
+import json
+import time
+
+from ortools.sat.python import cp_model
+
+from bench_model_build import synthetic_instance
+from bench_symmetry import sectioned_instance
+from bench_window_constraints import with_staff
+from timetable_greedy import greedy_hint, greedy_timetable, _best_construction
+from timetable_solver import DAYS, add_timetable_hint, build_timetable_model
+
+# test_jsons instances that with_staff can staff (the others are invalid on purpose)
+TEST_JSONS = ["test_1", "test_3", "test_4", "test_6", "test_9", "test_10"]
+
+
+def instances():
+    """(label, data, build settings)"""
+    with open("data.json") as f:
+        yield "data.json", json.load(f), {}
+    for name in TEST_JSONS:
+        with open(f"test_jsons/{name}.json") as f:
+            yield name, with_staff(json.load(f)), {}
+    yield "8 sections x 2", sectioned_instance(8, 2), {}
+    yield "4 sections, 4/day", sectioned_instance(4, 2), {"periods_per_day": 4}
+    yield "5 sections, 1/day", sectioned_instance(5, 2), {"periods_per_day": 5, "max_per_day": 1}
+    yield "100 classes", synthetic_instance(100), {}
+    yield "20 classes, full week", synthetic_instance(20, periods=4), {}
+    yield "full week, 10/teacher", synthetic_instance(20, periods=4, classes_per_teacher=10), {}
+
+
+def greedy(data, settings, time_limit):
+    options = dict(settings)
+    periods_per_day = options.pop("periods_per_day", 8)
+    start = time.perf_counter()
+    _, unplaced, score, _ = _best_construction(data, periods_per_day, DAYS, time_limit, 0, options)
+    return {"seconds": time.perf_counter() - start, "unplaced": unplaced, "score": score}
+
+
+def exact(data, settings, time_limit, workers, hint):
+    """CP-SAT, cold or warm-started from the greedy timetable"""
+    options = dict(settings)
+    periods_per_day = options.pop("periods_per_day", 8)
+    start = time.perf_counter()
+    built = build_timetable_model(data, periods_per_day, lean=True, **options)
+    if hint:
+        add_timetable_hint(built, greedy_hint(data, periods_per_day, DAYS, 1.0, **options))
+    solver = cp_model.CpSolver()
+    solver.parameters.max_time_in_seconds = time_limit
+    solver.parameters.num_workers = workers
+    status = solver.Solve(built["model"])
+    return {
+        "status": solver.StatusName(status),
+        "objective": solver.ObjectiveValue() if status in (cp_model.OPTIMAL, cp_model.FEASIBLE) else None,
+        "seconds": time.perf_counter() - start,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Speed and quality of the greedy constructor against CP-SAT, cold and warm-started.")
+    parser.add_argument("--greedy-time", type=float, default=1.0, help="Seconds the greedy constructor may restart for")
+    parser.add_argument("--time-limit", type=float, default=30.0, help="Seconds per CP-SAT solve")
+    parser.add_argument("--workers", type=int, default=1, help="CP-SAT workers per solve")
+    args = parser.parse_args()
+
+    print(f"{'instance':<24} {'greedy s':>8} {'unplaced':>8} {'score':>6} | {'cold':<10} {'obj':>5} {'s':>7} | {'hinted':<10} {'obj':>5} {'s':>7}")
+    for label, data, settings in instances():
+        g = greedy(data, settings, args.greedy_time)
+        cold = exact(data, settings, args.time_limit, args.workers, hint=False)
+        warm = exact(data, settings, args.time_limit, args.workers, hint=True)
+        cells = []
+        for row in (cold, warm):
+            objective = "-" if row["objective"] is None else f"{row['objective']:.0f}"
+            cells.append(f"{row['status']:<10} {objective:>5} {row['seconds']:>7.2f}")
+        print(f"{label:<24} {g['seconds']:>8.3f} {g['unplaced']:>8} {g['score']:>6.0f} | {cells[0]} | {cells[1]}")
+
+    # The standalone fast mode on the default instance
+    with open("data.json") as f:
+        result = greedy_timetable(json.load(f))
+    print(f"\ngreedy_timetable(data.json): {result['status']}, score {result.get('solver_score')}")
@@ -0,0 +1,43 @@
+import argparse
+import multiprocessing
+
+from timetable_solver import build_timetable_model
+
+SUBJECTS = ["Math", "English", "Science", "History", "Geography", "Art", "Music", "PE", "Biology", "Chemistry"]
+
+
+def synthetic_instance(num_classes, periods=3, classes_per_teacher=5):
+    """num_classes classes taking every subject; each teacher covers classes_per_teacher of them"""
+    groups = range((num_classes + classes_per_teacher - 1) // classes_per_teacher)
+    return {
+        "subjects": [{"Subject": f"{s} {g}", "Periods": periods} for g in groups for s in SUBJECTS],
+        "teachers": [{"Teacher": f"{s} teacher {g}", "Subject": f"{s} {g}"} for g in groups for s in SUBJECTS],
+        "classes": [
+            {"class": f"Class {i}", "subjects": [f"{s} {i // classes_per_teacher}" for s in SUBJECTS]}
+            for i in range(num_classes)
+        ]
+    }
+
+
+def _build(args):
+    num_classes, lean = args
+    built = build_timetable_model(synthetic_instance(num_classes), lean=lean, report_memory=True)
+    return built["model_stats"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare model build time and memory of the default and lean modes.")
+    parser.add_argument("--classes", type=int, nargs="+", default=[100, 1000], help="Instance sizes to build")
+    args = parser.parse_args()
+
+    print(f"{'classes':>8} {'mode':<8} {'variables':>10} {'constraints':>12} {'build s':>8} {'model MB':>9}")
+    # A fresh process per build, so memory freed by one build is not reused by the next
+    context = multiprocessing.get_context("spawn")
+    for num_classes in args.classes:
+        for lean in (False, True):
+            with context.Pool(1) as pool:
+                stats = pool.map(_build, [(num_classes, lean)])[0]
+            print(
+                f"{num_classes:>8} {'lean' if lean else 'default':<8} {stats['variables']:>10} "
+                f"{stats['constraints']:>12} {stats['build_seconds']:>8.2f} {stats['rss_growth_bytes'] / 2**20:>9.1f}"
+            )
@@ -0,0 +1,27 @@
+import argparse
+import os
+
+from bench_model_build import synthetic_instance
+from timetable_solver import build_timetable_model
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Model build time against the number of build workers.")
+    parser.add_argument("--classes", type=int, nargs="+", default=[500, 2000], help="Instance sizes to build")
+    parser.add_argument("--workers", type=int, nargs="+", help="Build worker counts (default: 1, 2, 4, ... up to the CPU count)")
+    args = parser.parse_args()
+
+    cpus = os.cpu_count() or 1
+    workers = args.workers or sorted({min(2 ** i, cpus) for i in range(cpus.bit_length() + 1)})
+
+    print(f"{'classes':>8} {'workers':>8} {'variables':>10} {'constraints':>12} {'build s':>8} {'speedup':>8}")
+    for num_classes in args.classes:
+        data = synthetic_instance(num_classes)
+        serial = None
+        for count in workers:
+            stats = build_timetable_model(data, lean=True, report_memory=True, build_workers=count)["model_stats"]
+            serial = serial or stats["build_seconds"]
+            print(
+                f"{num_classes:>8} {count:>8} {stats['variables']:>10} {stats['constraints']:>12} "
+                f"{stats['build_seconds']:>8.2f} {serial / stats['build_seconds']:>8.2f}"
+            )
@@ -0,0 +1,80 @@
+import argparse
+import glob
+import json
+from collections import Counter
+
+from ortools.sat.python import cp_model
+
+from bench_window_constraints import with_staff
+from instance_schema import validate_instance
+from timetable_solver import build_timetable_model, extract_timetable, feasibility_errors, solution_values
+
+VARIANTS = {
+    "no spread rule": {},
+    "max 2 per day": {"max_per_day": 2},
+    "max 2/day, 3+ days": {"max_per_day": 2, "min_days": 3},
+    "max 1 per day": {"max_per_day": 1},
+}
+
+
+def worst_day(result):
+    """Most periods of one subject a class has on a single day"""
+    periods_per_day = result["periods_per_day"]
+    worst = 0
+    for slots in result["timetable"].values():
+        counts = Counter((subject, int(s) // periods_per_day) for s, subjects in slots.items() for subject in subjects)
+        worst = max(worst, max(counts.values(), default=0))
+    return worst
+
+
+def solve_variant(data, settings, time_limit):
+    built = build_timetable_model(data, lean=True, **settings)
+    if built["status"] == "fail":
+        return {"status": "REJECTED", "message": built["message"]}
+
+    solver = cp_model.CpSolver()
+    solver.parameters.max_time_in_seconds = time_limit
+    solver.parameters.num_workers = 1
+    status = solver.Solve(built["model"])
+    row = {
+        "status": solver.StatusName(status),
+        "objective": None,
+        "worst_day": None,
+        "seconds": solver.WallTime(),
+        "branches": solver.NumBranches(),
+        "conflicts": solver.NumConflicts()
+    }
+    if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
+        result = extract_timetable(built, solution_values(solver.ResponseProto()), solver.ObjectiveValue())
+        row["objective"] = result["solver_score"]
+        row["worst_day"] = worst_day(result)
+    return row
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the per-day spread rules on real instances.")
+    parser.add_argument("instances", nargs="*", help="Instance JSON files (default: data.json and test_jsons)")
+    parser.add_argument("--time-limit", type=float, default=20.0, help="Seconds per solve")
+    parser.add_argument("--classes-per-teacher", type=int, default=4, help="Staffing of overloaded instances")
+    args = parser.parse_args()
+
+    paths = args.instances or ["data.json"] + sorted(glob.glob("test_jsons/*.json"))
+    print(f"{'instance':<24} {'rule':<20} {'status':<10} {'objective':>9} {'worst day':>9} {'seconds':>8} {'branches':>9} {'conflicts':>9}")
+    for path in paths:
+        with open(path) as f:
+            data = json.load(f)
+        if validate_instance(data)[1]:
+            continue
+        if feasibility_errors(data):
+            data = with_staff(data, args.classes_per_teacher)
+        for label, settings in VARIANTS.items():
+            row = solve_variant(data, settings, args.time_limit)
+            if row["status"] == "REJECTED":
+                print(f"{path:<24} {label:<20} {row['message']}")
+                continue
+            objective = "-" if row["objective"] is None else f"{row['objective']:.0f}"
+            worst = "-" if row["worst_day"] is None else row["worst_day"]
+            print(
+                f"{path:<24} {label:<20} {row['status']:<10} {objective:>9} {worst:>9} "
+                f"{row['seconds']:>8.2f} {row['branches']:>9} {row['conflicts']:>9}"
+            )
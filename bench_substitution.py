@@ -0,0 +1,86 @@
+import argparse
+import json
+import random
+
+from ortools.sat.python import cp_model
+
+from substitution import _fixed_subjects, _qualifications, _swap_day
+from timetable_query import TimetableIndex
+from timetable_solver import DAYS, add_timetable_hint, build_timetable_model, solve_timetable
+
+
+def instances():
+    """(label, data, solve settings): data.json as is, with double periods and with a stricter run rule"""
+    with open("data.json") as f:
+        data = json.load(f)
+    yield "data.json", data, {}
+    blocked = json.loads(json.dumps(data))
+    blocked["subjects"][0].update(BlockSize=2, Blocks=1)
+    yield "data.json, doubles", blocked, {}
+    yield "data.json, run <= 1", data, {"max_run_length": 1}
+
+
+def random_qualifications(data, share, rng):
+    """The listed qualifications plus a random share of the other subjects,
+    so that moving lessons can bring qualified cover and swaps happen"""
+    qualified = _qualifications(data)
+    subjects = sorted({s["Subject"] for s in data["subjects"]})
+    for teacher in qualified:
+        qualified[teacher] |= set(rng.sample(subjects, int(len(subjects) * share)))
+    return qualified
+
+
+def swapped_timetable(result, swap, day):
+    """result's timetable with the swapped day of the moved classes"""
+    ppd = result["periods_per_day"]
+    timetable = {c: dict(cells) for c, cells in result["timetable"].items()}
+    for c, periods in swap["timetable"].items():
+        for p, subjects in enumerate(periods):
+            timetable[c][str(day * ppd + p)] = subjects
+    return timetable
+
+
+def satisfies_rules(data, timetable, settings):
+    """True if the solver's model accepts timetable with every variable fixed to it"""
+    built = build_timetable_model(data, break_symmetry=False, lean=True, **settings)
+    add_timetable_hint(built, timetable)
+    solver = cp_model.CpSolver()
+    solver.parameters.fix_variables_to_their_hinted_value = True
+    solver.parameters.num_workers = 1
+    solver.parameters.max_time_in_seconds = 10.0
+    return solver.Solve(built["model"]) in (cp_model.OPTIMAL, cp_model.FEASIBLE)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check that substitution swaps keep the solver's hard rules.")
+    parser.add_argument("--time-limit", type=float, default=20.0, help="Seconds for each timetable solve")
+    parser.add_argument("--share", type=float, default=0.1, help="Share of other subjects a teacher may cover")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the first random qualifications")
+    parser.add_argument("--rounds", type=int, default=10, help="Random qualifications to try per instance")
+    args = parser.parse_args()
+
+    broken = 0
+    for label, data, settings in instances():
+        result = solve_timetable(data, time_limit=args.time_limit, **settings)
+        if result["status"] != "success":
+            print(f"{label}: no timetable ({result['message']})")
+            continue
+        index = TimetableIndex(result, data)
+        swaps = invalid = 0
+        for seed in range(args.seed, args.seed + args.rounds):
+            qualified = random_qualifications(data, args.share, random.Random(seed))
+            for teacher in index.teachers:
+                for day in range(DAYS):
+                    swap = _swap_day(
+                        index, teacher, day, qualified, 5.0, _fixed_subjects(data),
+                        settings.get("max_run_length", 2), settings.get("min_spacing")
+                    )
+                    if swap["status"] != "success" or not swap["moves"]:
+                        continue
+                    swaps += 1
+                    if not satisfies_rules(data, swapped_timetable(result, swap, day), settings):
+                        invalid += 1
+                        print(f"  {label}: swap for {teacher} on day {day} (seed {seed}) breaks a hard rule")
+        print(f"{label}: {swaps} swaps, {invalid} break a hard rule")
+        broken += invalid
+    raise SystemExit(1 if broken else 0)
@@ -0,0 +1,67 @@
+import argparse
+
+from ortools.sat.python import cp_model
+
+from timetable_solver import build_timetable_model
+
+SUBJECTS = {"Math": 5, "English": 4, "Science": 4, "History": 3, "Art": 2}
+
+# (label, sections per grade, build settings). The tight ones (one period
+# a day, or 4 periods a day so that every class repeats some period) need
+# real search to prove the optimum
+SCENARIOS = [
+    ("6 sections", 6, {}),
+    ("8 sections", 8, {}),
+    ("5 sections, 1/day", 5, {"periods_per_day": 5, "max_per_day": 1}),
+    ("4 sections, 4/day", 4, {"periods_per_day": 4}),
+]
+
+
+def sectioned_instance(sections, grades=1):
+    """grades x sections identical classes; each grade has its own teacher per subject"""
+    subjects, teachers, classes = [], [], []
+    for grade in range(10, 10 + grades):
+        for subject, periods in SUBJECTS.items():
+            subjects.append({"Subject": f"{subject} {grade}", "Periods": periods})
+            teachers.append({"Teacher": f"{subject} teacher {grade}", "Subject": f"{subject} {grade}"})
+        for section in range(sections):
+            classes.append({"class": f"Grade {grade}{chr(65 + section)}", "subjects": [f"{s} {grade}" for s in SUBJECTS]})
+    return {"subjects": subjects, "teachers": teachers, "classes": classes}
+
+
+def solve(data, settings, break_symmetry, time_limit, workers, seed):
+    built = build_timetable_model(data, lean=True, break_symmetry=break_symmetry, **settings)
+    solver = cp_model.CpSolver()
+    solver.parameters.max_time_in_seconds = time_limit
+    solver.parameters.num_workers = workers
+    solver.parameters.random_seed = seed
+    status = solver.Solve(built["model"])
+    return {
+        "status": solver.StatusName(status),
+        "objective": solver.ObjectiveValue() if status in (cp_model.OPTIMAL, cp_model.FEASIBLE) else None,
+        "bound": solver.BestObjectiveBound(),
+        "seconds": solver.WallTime(),
+        "branches": solver.NumBranches(),
+        "conflicts": solver.NumConflicts()
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time to optimal with and without symmetry breaking on identical sections.")
+    parser.add_argument("--grades", type=int, default=2, help="Grades, each with its own teachers")
+    parser.add_argument("--time-limit", type=float, default=60.0, help="Seconds per solve")
+    parser.add_argument("--workers", type=int, default=1, help="CP-SAT workers per solve")
+    parser.add_argument("--seeds", type=int, default=2, help="Solves per scenario and mode, with different random seeds")
+    args = parser.parse_args()
+
+    print(f"{'scenario':<20} {'symmetry':<9} {'seed':>4} {'status':<10} {'objective':>9} {'bound':>6} {'seconds':>8} {'branches':>9} {'conflicts':>9}")
+    for label, sections, settings in SCENARIOS:
+        data = sectioned_instance(sections, args.grades)
+        for break_symmetry in (False, True):
+            for seed in range(args.seeds):
+                row = solve(data, settings, break_symmetry, args.time_limit, args.workers, seed)
+                objective = "-" if row["objective"] is None else f"{row['objective']:.0f}"
+                print(
+                    f"{label:<20} {'broken' if break_symmetry else 'kept':<9} {seed:>4} {row['status']:<10} {objective:>9} "
+                    f"{row['bound']:>6.0f} {row['seconds']:>8.2f} {row['branches']:>9} {row['conflicts']:>9}"
+                )
@@ -0,0 +1,82 @@
+import argparse
+import ast
+import io
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+
+from instance_schema import decode_instance, validate_directory
+
+
+# The commit before instance_schema, whose test.py has validate_json_data
+BASELINE = "71f71b8"
+
+
+def load_legacy_validator():
+    """validate_json_data from the baseline commit, or None outside a git checkout"""
+    try:
+        source = subprocess.run(
+            ["git", "show", f"{BASELINE}:test.py"], capture_output=True, text=True, check=True
+        ).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    # test.py is a Streamlit script: run only the function definition
+    function = next(
+        node for node in ast.parse(source).body
+        if isinstance(node, ast.FunctionDef) and node.name == "validate_json_data"
+    )
+    namespace = {}
+    exec(compile(ast.Module(body=[function], type_ignores=[]), f"{BASELINE}:test.py", "exec"), namespace)
+    return namespace["validate_json_data"]
+
+
+def legacy_validate_file(validate_json_data, path, periods_per_day=8):
+    # ui.py parsed every upload twice before handing it to validate_json_data
+    with open(path, "rb") as f:
+        uploaded_file = io.BytesIO(f.read())
+    json.load(uploaded_file)
+    uploaded_file.seek(0)
+    data = json.load(uploaded_file)
+    return validate_json_data(data, periods_per_day)
+
+
+def schema_validate_file(path, periods_per_day=8):
+    with open(path, "rb") as f:
+        return decode_instance(f.read(), periods_per_day)[1]
+
+
+def build_corpus(source_dir, directory, num_files):
+    sources = sorted(
+        os.path.join(source_dir, name) for name in os.listdir(source_dir) if name.endswith(".json")
+    )
+    for i in range(num_files):
+        shutil.copy(sources[i % len(sources)], os.path.join(directory, f"instance_{i}.json"))
+
+
+def files_per_second(label, num_files, run):
+    start = time.perf_counter()
+    run()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<32} {num_files / elapsed:>10.0f} files/sec")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare instance validation throughput.")
+    parser.add_argument("--files", type=int, default=5000, help="Corpus size, built by copying test_jsons")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Processes for the bulk mode")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        build_corpus("test_jsons", directory, args.files)
+        paths = sorted(os.path.join(directory, name) for name in os.listdir(directory))
+
+        legacy = load_legacy_validator()
+        if legacy is None:
+            print(f"Skipping the baseline: commit {BASELINE} is not available")
+        else:
+            files_per_second("double parse + dict checks", len(paths), lambda: [legacy_validate_file(legacy, p) for p in paths])
+        files_per_second("single-pass typed decode", len(paths), lambda: [schema_validate_file(p) for p in paths])
+        files_per_second(f"bulk, {args.workers} processes", len(paths), lambda: validate_directory(directory, max_workers=args.workers))
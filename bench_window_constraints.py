@@ -0,0 +1,102 @@
+import argparse
+import glob
+import json
+
+from ortools.sat.python import cp_model
+
+from instance_schema import validate_instance
+from timetable_solver import build_timetable_model, feasibility_errors, solution_values, extract_timetable
+
+
+def with_staff(data, classes_per_teacher=4):
+    """Give every group of classes_per_teacher classes its own teachers.
+
+    The model has one teacher per subject, so the subjects are renamed per
+    group ("Math (2)"). Keeps the classes' real subject lists and periods
+    while making overloaded instances such as test_jsons staffable.
+    """
+    periods = {s["Subject"]: s["Periods"] for s in data["subjects"]}
+    teacher_of = {t["Subject"].strip(): t["Teacher"] for t in data["teachers"]}
+    classes, subjects, teachers = [], {}, {}
+    for i, c in enumerate(data["classes"]):
+        group = i // classes_per_teacher + 1
+        names = [f"{subject} ({group})" for subject in c["subjects"]]
+        for subject, name in zip(c["subjects"], names):
+            subjects[name] = periods[subject]
+            teachers[name] = f"{teacher_of[subject]} ({group})"
+        classes.append({"class": c["class"], "subjects": names})
+    return {
+        "classes": classes,
+        "subjects": [{"Subject": name, "Periods": p} for name, p in subjects.items()],
+        "teachers": [{"Teacher": teacher, "Subject": name} for name, teacher in teachers.items()]
+    }
+
+
+def add_flat_triples(built):
+    """The rule as it was: at most one period in any three slots, across day boundaries"""
+    model, variables, slots = built["model"], built["variables"], built["slots"]
+    for class_offsets in built["offsets"]:
+        for base in class_offsets:
+            for s in range(slots - 2):
+                model.AddAtMostOne(variables[base + s:base + s + 3])
+
+
+VARIANTS = {
+    "no window rule": {"max_run_length": None},
+    "flat triples (old)": {"max_run_length": None, "flat_triples": True},
+    "run <= 2 per day": {"max_run_length": 2},
+    "spacing 3 per day": {"max_run_length": None, "min_spacing": 3},
+}
+
+
+def solve_variant(data, settings, time_limit):
+    settings = dict(settings)
+    flat_triples = settings.pop("flat_triples", False)
+    built = build_timetable_model(data, lean=True, **settings)
+    if flat_triples:
+        add_flat_triples(built)
+
+    solver = cp_model.CpSolver()
+    solver.parameters.max_time_in_seconds = time_limit
+    solver.parameters.num_workers = 1
+    status = solver.Solve(built["model"])
+    row = {
+        "constraints": len(built["model"].Proto().constraints),
+        "status": solver.StatusName(status),
+        "objective": None,
+        "repeats": None,
+        "seconds": solver.WallTime(),
+        "branches": solver.NumBranches(),
+        "conflicts": solver.NumConflicts()
+    }
+    if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
+        result = extract_timetable(built, solution_values(solver.ResponseProto()), solver.ObjectiveValue())
+        row["objective"] = result["solver_score"]
+        row["repeats"] = result["consecutive_repeats"]
+    return row
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the window rules on real instances.")
+    parser.add_argument("instances", nargs="*", help="Instance JSON files (default: data.json and test_jsons)")
+    parser.add_argument("--time-limit", type=float, default=20.0, help="Seconds per solve")
+    parser.add_argument("--classes-per-teacher", type=int, default=4, help="Staffing of overloaded instances")
+    args = parser.parse_args()
+
+    paths = args.instances or ["data.json"] + sorted(glob.glob("test_jsons/*.json"))
+    print(f"{'instance':<24} {'rule':<20} {'constraints':>11} {'status':<10} {'objective':>9} {'repeats':>7} {'seconds':>8} {'branches':>9} {'conflicts':>9}")
+    for path in paths:
+        with open(path) as f:
+            data = json.load(f)
+        if validate_instance(data)[1]:
+            continue
+        if feasibility_errors(data):
+            data = with_staff(data, args.classes_per_teacher)
+        for label, settings in VARIANTS.items():
+            row = solve_variant(data, settings, args.time_limit)
+            objective = "-" if row["objective"] is None else f"{row['objective']:.0f}"
+            repeats = "-" if row["repeats"] is None else row["repeats"]
+            print(
+                f"{path:<24} {label:<20} {row['constraints']:>11} {row['status']:<10} {objective:>9} "
+                f"{repeats:>7} {row['seconds']:>8.2f} {row['branches']:>9} {row['conflicts']:>9}"
+            )
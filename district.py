@@ -0,0 +1,161 @@
+import argparse
+import json
+import os
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+from timetable_query import TimetableIndex
+from timetable_solver import DAYS, solve_timetable
+
+
+def shared_teachers(schools):
+    """Teachers listed by more than one school"""
+    seen = defaultdict(set)
+    for school, data in schools.items():
+        for t in data.get("teachers", []):
+            seen[t["Teacher"]].add(school)
+    return {teacher for teacher, where in seen.items() if len(where) > 1}
+
+
+def travel_time(travel_periods, school, other):
+    """Free periods a teacher needs between lessons at school and other"""
+    if isinstance(travel_periods, dict):
+        return travel_periods.get((school, other), travel_periods.get((other, school), 0))
+    return travel_periods or 0
+
+
+def _buffer(slot, travel, periods_per_day):
+    """slot and the travel periods before and after it on the same day"""
+    day, period = divmod(slot, periods_per_day)
+    first = day * periods_per_day
+    return range(first + max(0, period - travel), first + min(periods_per_day, period + travel + 1))
+
+
+def _solve_school(data, periods_per_day, days_per_week, unavailable, hint, time_limit, num_workers, model_options):
+    return solve_timetable(
+        data, periods_per_day, time_limit=time_limit, num_workers=num_workers, hint=hint,
+        days_per_week=days_per_week, teacher_unavailable=unavailable, **model_options
+    )
+
+
+def solve_district(schools, shared=None, travel_periods=0, periods_per_day=8, days_per_week=DAYS,
+                   max_rounds=None, max_workers=None, time_limit=30.0, **model_options):
+    """Solve several schools whose timetables share some teachers.
+
+    schools is {school name: instance data}, in priority order; shared
+    lists the teachers who work at more than one school (by default every
+    teacher name listed by two or more schools). Each school is solved as
+    its own model, in parallel. After every round, a shared teacher's
+    lessons at a school are blocked, with travel_periods free periods
+    around them, at every lower-priority school, and only the schools
+    that clash are re-solved, hinted with their last timetable. The first
+    school never moves after round one, the second after round two and so
+    on, so the district settles within len(schools) rounds.
+
+    travel_periods is a number for every pair of schools or a
+    {(school, other): periods} dict. Returns {"status", "schools": {name:
+    solve_timetable result}, "rounds", "shared_teachers", "blocked":
+    {school: {teacher: [slot]}}}.
+    """
+    names = list(schools)
+    shared = shared_teachers(schools) if shared is None else set(shared)
+    max_rounds = max_rounds or len(names)
+    cpus = os.cpu_count() or 1
+    max_workers = min(max_workers or cpus, len(names))
+    solver_workers = max(1, cpus // max_workers)
+
+    blocked = {school: {} for school in names}
+    results = {}
+    pending = names
+    failed = []
+    rounds = 0
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        while pending and rounds < max_rounds:
+            rounds += 1
+            futures = {
+                school: pool.submit(
+                    _solve_school, schools[school], periods_per_day, days_per_week,
+                    {teacher: sorted(slots) for teacher, slots in blocked[school].items()},
+                    results[school]["timetable"] if school in results else None,
+                    time_limit, solver_workers, model_options
+                )
+                for school in pending
+            }
+            failed = []
+            for school, future in futures.items():
+                results[school] = future.result()
+                if results[school]["status"] != "success":
+                    failed.append(school)
+            if failed:
+                break
+
+            # Slots each shared teacher teaches at each school
+            busy = {}
+            for school in names:
+                index = TimetableIndex(results[school], schools[school])
+                busy[school] = {
+                    teacher: {s for s, lessons in enumerate(index.teacher_slots[teacher]) if lessons}
+                    for teacher in shared if teacher in index.teacher_slots
+                }
+
+            # Higher-priority schools keep their slots; lower ones work around them
+            pending = []
+            for i, school in enumerate(names):
+                needed = defaultdict(set)
+                for other in names[:i]:
+                    travel = travel_time(travel_periods, school, other)
+                    for teacher, slots in busy[other].items():
+                        if teacher in busy[school]:
+                            for s in slots:
+                                needed[teacher].update(_buffer(s, travel, periods_per_day))
+                blocked[school] = dict(needed)
+                if any(busy[school][teacher] & slots for teacher, slots in needed.items()):
+                    pending.append(school)
+
+    result = {
+        "status": "success",
+        "schools": results,
+        "rounds": rounds,
+        "shared_teachers": sorted(shared),
+        "blocked": {school: {teacher: sorted(slots) for teacher, slots in b.items()} for school, b in blocked.items()}
+    }
+    if failed:
+        school = failed[0]
+        result["status"] = "fail"
+        result["message"] = f"School '{school}' (round {rounds}): {results[school]['message']}"
+    elif pending:
+        result["status"] = "fail"
+        result["message"] = f"Shared teachers still clash at {', '.join(pending)} after {rounds} rounds."
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Solve the timetables of several schools that share teachers.")
+    parser.add_argument("schools", nargs="+", help="One instance JSON per school, highest priority first")
+    parser.add_argument("--shared", nargs="*", help="Shared teachers (default: every teacher listed by two or more schools)")
+    parser.add_argument("--travel", type=int, default=0, help="Free periods a teacher needs between schools")
+    parser.add_argument("--periods", type=int, default=8, help="Periods per day")
+    parser.add_argument("--days", type=int, default=DAYS, help="Days per week")
+    parser.add_argument("--time-limit", type=float, default=30.0, help="Seconds per school solve")
+    parser.add_argument("--output", help="Write {school: timetable} JSON here")
+    args = parser.parse_args()
+
+    schools = {}
+    for path in args.schools:
+        with open(path) as f:
+            schools[os.path.splitext(os.path.basename(path))[0]] = json.load(f)
+
+    result = solve_district(
+        schools, shared=args.shared, travel_periods=args.travel, periods_per_day=args.periods,
+        days_per_week=args.days, time_limit=args.time_limit
+    )
+    if result["status"] != "success":
+        print(result["message"])
+    print(f"Rounds: {result['rounds']}")
+    for school, school_result in result["schools"].items():
+        print(f"{school}: {school_result['status']}, score {school_result.get('solver_score')}")
+
+    if args.output and result["status"] == "success":
+        with open(args.output, "w") as f:
+            json.dump({school: r["timetable"] for school, r in result["schools"].items()}, f, indent=2)
+        print(f"Timetables saved as {args.output}")
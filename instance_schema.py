@@ -0,0 +1,294 @@
+import glob
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple
+
+
+class Instance(NamedTuple):
+    """A validated instance, stored column-wise as flat tuples"""
+    subject_names: tuple
+    subject_periods: tuple
+    teacher_names: tuple
+    teacher_subjects: tuple
+    class_names: tuple
+    class_subjects: tuple  # one tuple of subject names per class
+    subject_block_sizes: tuple = ()  # 1 for single periods
+    subject_blocks: tuple = ()  # None for as many blocks as the periods allow
+    option_blocks: tuple = ()  # (name, class names, subject names) per option block
+
+    def to_data(self):
+        """Convert back to the plain dict format solve_timetable takes"""
+        subjects = [{"Subject": name, "Periods": periods} for name, periods in zip(self.subject_names, self.subject_periods)]
+        for subject, size, count in zip(subjects, self.subject_block_sizes, self.subject_blocks):
+            if size != 1:
+                subject["BlockSize"] = size
+            if count is not None:
+                subject["Blocks"] = count
+        data = {
+            "classes": [{"class": name, "subjects": list(subjects)} for name, subjects in zip(self.class_names, self.class_subjects)],
+            "subjects": subjects,
+            "teachers": [{"Teacher": name, "Subject": subject} for name, subject in zip(self.teacher_names, self.teacher_subjects)]
+        }
+        if self.option_blocks:
+            data["option_blocks"] = [
+                {"block": name, "classes": list(classes), "subjects": list(block_subjects)}
+                for name, classes, block_subjects in self.option_blocks
+            ]
+        return data
+
+
+class SchemaError(NamedTuple):
+    path: str
+    message: str
+
+    def __str__(self):
+        return f"{self.path}: {self.message}"
+
+
+def _is_int(value):
+    return type(value) is int
+
+
+def _is_name(value):
+    return type(value) is str and value.strip() != ""
+
+
+def _name_error(path, value):
+    if value is None:
+        return SchemaError(path, "Missing field.")
+    return SchemaError(path, "Must be a non-empty string.")
+
+
+def _entries(data, key, errors):
+    """The object entries of list data[key]; other entries are reported"""
+    value = data.get(key)
+    if type(value) is not list:
+        return []
+    if all(type(entry) is dict for entry in value):
+        return value
+    for i, entry in enumerate(value):
+        if type(entry) is not dict:
+            errors.append(SchemaError(f"$.{key}[{i}]", "Must be an object."))
+    return [entry if type(entry) is dict else {} for entry in value]
+
+
+def _walk(data, total_slots, periods_per_day):
+    """Walk data entry by entry: build its records and report every problem with its JSON path.
+
+    Returns (instance, errors); instance is None unless errors is empty.
+    """
+    errors = []
+    if type(data) is not dict:
+        return None, [SchemaError("$", "Instance must be a JSON object.")]
+
+    for key in ["classes", "subjects", "teachers"]:
+        if key not in data:
+            errors.append(SchemaError("$", f"Missing key: '{key}'."))
+        elif type(data[key]) is not list or not data[key]:
+            errors.append(SchemaError(f"$.{key}", "Must be a non-empty list."))
+
+    # Subjects first: teachers and classes refer to them
+    subject_names = []
+    subject_periods = []
+    subject_block_sizes = []
+    subject_blocks = []
+    periods_by_subject = {}
+    for i, s in enumerate(_entries(data, "subjects", errors)):
+        name = s.get("Subject")
+        periods = s.get("Periods")
+        if not _is_name(name):
+            errors.append(_name_error(f"$.subjects[{i}].Subject", name))
+            name = None
+        elif name in periods_by_subject:
+            errors.append(SchemaError(f"$.subjects[{i}].Subject", f"Duplicate subject '{name}'."))
+        if periods is None:
+            errors.append(SchemaError(f"$.subjects[{i}].Periods", "Missing field."))
+        elif not _is_int(periods):
+            errors.append(SchemaError(f"$.subjects[{i}].Periods", "Must be an integer."))
+            periods = None
+        elif periods < 0:
+            errors.append(SchemaError(f"$.subjects[{i}].Periods", "Must not be negative."))
+        elif periods > total_slots:
+            errors.append(SchemaError(
+                f"$.subjects[{i}].Periods",
+                f"Subject '{name}' requires {periods} periods, which exceeds the total available slots ({total_slots})."
+            ))
+        block_size = s.get("BlockSize", 1)
+        blocks = s.get("Blocks")
+        if not _is_int(block_size):
+            errors.append(SchemaError(f"$.subjects[{i}].BlockSize", "Must be an integer."))
+        elif not 1 <= block_size <= periods_per_day:
+            errors.append(SchemaError(f"$.subjects[{i}].BlockSize", f"Must be between 1 and the periods per day ({periods_per_day})."))
+        elif blocks is not None:
+            if not _is_int(blocks) or blocks < 0:
+                errors.append(SchemaError(f"$.subjects[{i}].Blocks", "Must be a non-negative integer."))
+            elif _is_int(periods) and blocks * block_size > periods:
+                errors.append(SchemaError(f"$.subjects[{i}].Blocks", f"{blocks} blocks of {block_size} periods exceed the subject's {periods} periods."))
+        if name is not None:
+            periods_by_subject[name] = periods
+        subject_names.append(name)
+        subject_periods.append(periods)
+        subject_block_sizes.append(block_size)
+        subject_blocks.append(blocks)
+
+    teacher_names = []
+    teacher_subjects = []
+    for i, t in enumerate(_entries(data, "teachers", errors)):
+        name = t.get("Teacher")
+        subject = t.get("Subject")
+        if not _is_name(name):
+            errors.append(_name_error(f"$.teachers[{i}].Teacher", name))
+        if not _is_name(subject):
+            errors.append(_name_error(f"$.teachers[{i}].Subject", subject))
+            continue
+        subject = subject.strip()
+        if subject not in periods_by_subject:
+            errors.append(SchemaError(f"$.teachers[{i}].Subject", f"Subject '{subject}' is not defined in the subjects list."))
+        teacher_names.append(name)
+        teacher_subjects.append(subject)
+
+    taught = set(teacher_subjects)
+    if taught:
+        for i, name in enumerate(subject_names):
+            if name is not None and name not in taught:
+                errors.append(SchemaError(f"$.subjects[{i}]", f"No teacher assigned for subject '{name}'."))
+
+    # Option blocks: periods each class spends in them
+    own_subjects = {
+        c.get("class"): set(s for s in c.get("subjects") if type(s) is str) if type(c.get("subjects")) is list else set()
+        for c in _entries(data, "classes", []) if type(c.get("class")) is str
+    }
+    option_blocks = []
+    block_periods = {}
+    block_names = set()
+    if "option_blocks" in data and type(data["option_blocks"]) is not list:
+        errors.append(SchemaError("$.option_blocks", "Must be a list."))
+    for i, b in enumerate(_entries(data, "option_blocks", errors)):
+        name = b.get("block")
+        if not _is_name(name):
+            errors.append(_name_error(f"$.option_blocks[{i}].block", name))
+        elif name in block_names:
+            errors.append(SchemaError(f"$.option_blocks[{i}].block", f"Duplicate option block '{name}'."))
+        elif name in periods_by_subject or name in own_subjects:
+            errors.append(SchemaError(f"$.option_blocks[{i}].block", f"Option block '{name}' has the name of a subject or class."))
+        if _is_name(name):
+            block_names.add(name)
+        block_subjects = b.get("subjects")
+        periods = set()
+        if type(block_subjects) is not list or not block_subjects:
+            errors.append(SchemaError(f"$.option_blocks[{i}].subjects", "Must be a non-empty list of subjects."))
+        else:
+            for j, subject in enumerate(block_subjects):
+                if type(subject) is not str or subject not in periods_by_subject:
+                    errors.append(SchemaError(f"$.option_blocks[{i}].subjects[{j}]", f"Subject '{subject}' is not defined in the subjects list."))
+                elif periods_by_subject[subject] is not None:
+                    periods.add(periods_by_subject[subject])
+            if len(periods) > 1:
+                errors.append(SchemaError(f"$.option_blocks[{i}].subjects", "The subjects of an option block must have the same number of periods."))
+        block_classes = b.get("classes")
+        if type(block_classes) is not list or not block_classes:
+            errors.append(SchemaError(f"$.option_blocks[{i}].classes", "Must be a non-empty list of classes."))
+            continue
+        listed = set()
+        for j, class_name in enumerate(block_classes):
+            if type(class_name) is not str or class_name not in own_subjects:
+                errors.append(SchemaError(f"$.option_blocks[{i}].classes[{j}]", f"Class '{class_name}' is not defined in the classes list."))
+                continue
+            if class_name in listed:
+                errors.append(SchemaError(f"$.option_blocks[{i}].classes[{j}]", f"Class '{class_name}' is listed twice."))
+                continue
+            listed.add(class_name)
+            if type(block_subjects) is list:
+                for subject in own_subjects[class_name].intersection(s for s in block_subjects if type(s) is str):
+                    errors.append(SchemaError(
+                        f"$.option_blocks[{i}].classes[{j}]",
+                        f"Class '{class_name}' takes '{subject}' in option block '{name}' and in its own subjects."
+                    ))
+            if periods:
+                block_periods[class_name] = block_periods.get(class_name, 0) + max(periods)
+        option_blocks.append((name, tuple(block_classes), tuple(block_subjects) if type(block_subjects) is list else ()))
+
+    class_names = []
+    class_subjects = []
+    for i, c in enumerate(_entries(data, "classes", errors)):
+        name = c.get("class")
+        subjects = c.get("subjects")
+        if not _is_name(name):
+            errors.append(_name_error(f"$.classes[{i}].class", name))
+        if type(subjects) is not list or not subjects:
+            errors.append(SchemaError(f"$.classes[{i}].subjects", "Must be a non-empty list of subjects."))
+            continue
+        try:
+            class_total_periods = sum(map(periods_by_subject.__getitem__, subjects))
+        except (KeyError, TypeError):
+            # Undefined subjects (or subjects with broken periods): find them
+            class_total_periods = 0
+            for j, subject in enumerate(subjects):
+                if type(subject) is not str or subject not in periods_by_subject:
+                    errors.append(SchemaError(f"$.classes[{i}].subjects[{j}]", f"Subject '{subject}' is not defined in the subjects list."))
+                elif periods_by_subject[subject] is not None:
+                    class_total_periods += periods_by_subject[subject]
+        class_total_periods += block_periods.get(name, 0)
+        if class_total_periods > total_slots:
+            errors.append(SchemaError(
+                f"$.classes[{i}].subjects",
+                f"Total periods required for class '{name}' is {class_total_periods}, which exceeds available slots ({total_slots})."
+            ))
+        class_names.append(name)
+        class_subjects.append(tuple(subjects))
+
+    if errors:
+        return None, errors
+    return Instance(
+        tuple(subject_names), tuple(subject_periods), tuple(teacher_names), tuple(teacher_subjects),
+        tuple(class_names), tuple(class_subjects),
+        tuple(subject_block_sizes), tuple(subject_blocks), tuple(option_blocks)
+    ), []
+
+
+def validate_instance(data, periods_per_day=8, days_per_week=5):
+    """Validate decoded instance JSON and build its typed records.
+
+    One walk checks and converts the entries, collecting every problem
+    with the JSON path it was found at. Returns (instance, errors);
+    instance is None unless errors is empty.
+    """
+    return _walk(data, days_per_week * periods_per_day, periods_per_day)
+
+
+def decode_instance(raw, periods_per_day=8, days_per_week=5):
+    """Decode instance JSON (str or bytes) and validate it with a single parse"""
+    try:
+        data = json.loads(raw)
+    except (json.JSONDecodeError, UnicodeDecodeError) as e:
+        return None, [SchemaError("$", f"Invalid JSON: {e}")]
+    return validate_instance(data, periods_per_day, days_per_week)
+
+
+def validate_file(path, periods_per_day=8, days_per_week=5):
+    with open(path, "rb") as f:
+        raw = f.read()
+    return decode_instance(raw, periods_per_day, days_per_week)[1]
+
+
+def _validate_file_args(args):
+    return validate_file(*args)
+
+
+def validate_directory(directory, periods_per_day=8, days_per_week=5, max_workers=None):
+    """Validate every *.json file in directory across worker processes.
+
+    Returns {path: errors}, in sorted path order.
+    """
+    paths = sorted(glob.glob(os.path.join(directory, "*.json")))
+    if not paths:
+        return {}
+    max_workers = min(max_workers or os.cpu_count() or 1, len(paths))
+    # Large chunks keep the per-file pickling overhead negligible
+    chunksize = max(1, len(paths) // (max_workers * 4))
+
+    args = [(path, periods_per_day, days_per_week) for path in paths]
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        results = pool.map(_validate_file_args, args, chunksize=chunksize)
+        return dict(zip(paths, results))
@@ -0,0 +1,76 @@
+import argparse
+import json
+
+from google.protobuf import text_format
+from ortools.sat import sat_parameters_pb2
+from ortools.sat.python import cp_model
+
+from timetable_solver import extract_timetable, load_model_dump, solution_values
+
+
+def replay_dump(path, num_workers=None, time_limit=None, extra_parameters=None, log_search=False):
+    """Re-solve a model dump, optionally under different solver parameters.
+
+    extra_parameters is SatParameters text format, e.g.
+    "linearization_level: 2 search_branching: FIXED_SEARCH". Returns the
+    timetable result and a dict of solve statistics.
+    """
+    built, dumped_parameters = load_model_dump(path)
+
+    # Later settings override earlier ones
+    parameters = sat_parameters_pb2.SatParameters()
+    text_format.Merge(dumped_parameters, parameters)
+    if extra_parameters:
+        text_format.Merge(extra_parameters, parameters)
+    if num_workers is not None:
+        parameters.num_workers = num_workers
+    if time_limit is not None:
+        parameters.max_time_in_seconds = time_limit
+    parameters.log_search_progress = log_search
+
+    solver = cp_model.CpSolver()
+    solver.parameters.parse_text_format(text_format.MessageToString(parameters))
+    status = solver.Solve(built["model"])
+
+    stats = {
+        "status": solver.StatusName(status),
+        "objective": solver.ObjectiveValue() if status in (cp_model.OPTIMAL, cp_model.FEASIBLE) else None,
+        "best_bound": solver.BestObjectiveBound(),
+        "wall_time": solver.WallTime(),
+        "branches": solver.NumBranches(),
+        "conflicts": solver.NumConflicts(),
+        "parameters": text_format.MessageToString(parameters, as_one_line=True)
+    }
+
+    if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
+        result = extract_timetable(built, solution_values(solver.ResponseProto()), solver.ObjectiveValue())
+    else:
+        result = {"status": "fail", "message": "No feasible solution. Try adjusting the constraints."}
+    return result, stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-solve a timetable model dump for offline profiling.")
+    parser.add_argument("dump", help="Zip written by solve_timetable(..., dump_path=...)")
+    parser.add_argument("--workers", type=int, help="Override num_workers")
+    parser.add_argument("--time-limit", type=float, help="Override max_time_in_seconds")
+    parser.add_argument("--params", help="Extra SatParameters in text format")
+    parser.add_argument("--log", action="store_true", help="Print the CP-SAT search log")
+    parser.add_argument("--output", help="Write the resulting timetable JSON here")
+    args = parser.parse_args()
+
+    result, stats = replay_dump(
+        args.dump,
+        num_workers=args.workers,
+        time_limit=args.time_limit,
+        extra_parameters=args.params,
+        log_search=args.log
+    )
+
+    for key, value in stats.items():
+        print(f"{key}: {value}")
+
+    if args.output and result["status"] == "success":
+        with open(args.output, "w") as f:
+            json.dump(result["timetable"], f, indent=2)
+        print(f"Timetable saved as {args.output}")
@@ -0,0 +1,104 @@
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from timetable_solver import solve_timetable
+
+# Settings a sweep grid may vary, with the defaults used by solve_timetable
+SWEEP_DEFAULTS = {
+    "periods_per_day": 8,
+    "consecutive_weight": 3,
+    "repeat_weight": 1,
+    "max_run_length": 2,
+    "min_spacing": None,
+    "max_per_day": None,
+    "min_days": None,
+    "teacher_max_per_day": None,
+    "teacher_gap_weight": 0,
+}
+
+
+def expand_grid(grid):
+    """Expand {setting: [values]} into one settings dict per combination"""
+    unknown = [key for key in grid if key not in SWEEP_DEFAULTS]
+    if unknown:
+        raise ValueError(f"Unknown sweep settings: {', '.join(unknown)}")
+
+    keys = list(grid)
+    variants = []
+    for values in itertools.product(*(grid[key] for key in keys)):
+        settings = dict(SWEEP_DEFAULTS)
+        settings.update(zip(keys, values))
+        variants.append(settings)
+    return variants
+
+
+def _solve_variant(data, settings, time_limit, num_workers):
+    start = time.perf_counter()
+    result = solve_timetable(data, time_limit=time_limit, num_workers=num_workers, **settings)
+    return {
+        "settings": settings,
+        "result": result,
+        "solve_time": time.perf_counter() - start
+    }
+
+
+def _sweep_in_pool(pool, data, variants, time_limit):
+    """Queue the variants in a SolverPool and wait for all of them"""
+    jobs = [pool.submit(data, time_limit=time_limit, **settings) for settings in variants]
+    try:
+        results = [job.wait_first() for job in jobs]
+    finally:
+        # Leaves the jobs still queued or running if the wait is interrupted, e.g. by a rerun
+        for job in jobs:
+            job.cancel()
+    return [
+        {"settings": settings, "result": result, "solve_time": job.solve_time}
+        for settings, job, result in zip(variants, jobs, results)
+    ]
+
+
+def run_sweep(data, grid, max_workers=None, time_limit=30.0, pool=None):
+    """Solve every variant of grid in parallel across a process pool.
+
+    CPU cores are split between the pool processes so the variants don't
+    oversubscribe the machine. With a SolverPool as pool, the variants
+    are queued there instead and share its slots and threads with every
+    other solve. Returns one dict per variant, in grid order, with its
+    settings, the solve_timetable result and the solve time in seconds.
+    """
+    variants = expand_grid(grid)
+    if not variants:
+        return []
+    if pool is not None:
+        return _sweep_in_pool(pool, data, variants, time_limit)
+    cpus = os.cpu_count() or 1
+    max_workers = min(max_workers or cpus, len(variants))
+    solver_workers = max(1, cpus // max_workers)
+
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futures = [
+            pool.submit(_solve_variant, data, settings, time_limit, solver_workers)
+            for settings in variants
+        ]
+        return [future.result() for future in futures]
+
+
+def sweep_table(runs):
+    """Comparison table of a sweep: one row per variant"""
+    rows = []
+    for run in runs:
+        result = run["result"]
+        feasible = result["status"] == "success"
+        row = dict(run["settings"])
+        row["Feasible"] = feasible
+        row["Objective"] = result["solver_score"] if feasible else None
+        row["Free Periods"] = sum(result["free_periods"].values()) if feasible else None
+        row["Consecutive Repeats"] = result["consecutive_repeats"] if feasible else None
+        row["Teacher Gaps"] = result["teacher_gap_stats"]["total"] if feasible else None
+        row["Solve Time (s)"] = round(run["solve_time"], 2)
+        rows.append(row)
+    return pd.DataFrame(rows)
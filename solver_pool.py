@@ -0,0 +1,176 @@
+import collections
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+
+from timetable_solver import SolveStop, solve_timetable, solve_timetable_staged
+
+
+class SolveJob:
+    """A solve queued in a SolverPool.
+
+    Identical submissions share one job. It offers the same interface as
+    StagedSolve (latest, done, wait_first, cancel), plus the job's state
+    ("queued", "running", "done" or "cancelled") and its queue position.
+    """
+
+    def __init__(self, pool, key, data, options, anytime, dump):
+        self.key = key
+        self.state = "queued"
+        self.latest = None
+        self.done = False
+        self.dump = None  # model dump bytes, for dump=True jobs
+        self.num_workers = None
+        self.solve_time = None  # seconds, once done
+        self.subscribers = 1
+        self._pool = pool
+        self._args = (data, options, anytime, dump)
+        self._first = threading.Event()
+        self._stop = SolveStop()
+
+    @property
+    def position(self):
+        """1-based place in the queue; 0 once the job has left it"""
+        return self._pool.position(self)
+
+    def _record(self, result):
+        self.latest = result
+        self._first.set()
+
+    def _run(self, num_workers):
+        data, options, anytime, dump = self._args
+        self.num_workers = num_workers
+        start = time.perf_counter()
+        try:
+            if anytime:
+                result = solve_timetable_staged(
+                    data, on_result=self._record, stop_event=self._stop, num_workers=num_workers, **options
+                )
+                if result["status"] == "fail" or self.latest is None:
+                    self.latest = result
+            elif dump:
+                buffer = io.BytesIO()
+                self.latest = solve_timetable(data, num_workers=num_workers, dump_path=buffer, **options)
+                self.dump = buffer.getvalue()
+            else:
+                self.latest = solve_timetable(data, num_workers=num_workers, **options)
+        except Exception as e:
+            self.latest = {"status": "fail", "message": f"Solver error: {e}"}
+        finally:
+            self.solve_time = time.perf_counter() - start
+            self.state = "done"
+            self.done = True
+            self._first.set()
+
+    def wait_first(self, timeout=None):
+        """Block until the first timetable (or a failure) is available."""
+        self._first.wait(timeout)
+        return self.latest
+
+    def cancel(self):
+        """Drop this submission; the solve stops once nobody else waits for it."""
+        self._pool.release(self)
+
+
+class SolverPool:
+    """Process-wide solve queue shared by every session of an app.
+
+    At most max_concurrent solves run at a time, each with
+    total_workers // max_concurrent CP-SAT threads, so together they fit
+    the machine. Waiting jobs start in submission order. A submission
+    identical to one that is queued or running joins it instead of
+    solving again. Plain and dump solves without a time_limit get
+    time_limit seconds, so no job holds a slot indefinitely.
+    """
+
+    def __init__(self, max_concurrent=None, total_workers=None, time_limit=60.0):
+        self.time_limit = time_limit
+        self.total_workers = total_workers or os.cpu_count() or 1
+        self.max_concurrent = max(1, min(max_concurrent or self.total_workers // 4, self.total_workers))
+        self.workers_per_job = max(1, self.total_workers // self.max_concurrent)
+        self._queue = collections.deque()
+        self._in_flight = {}  # key -> queued or running job
+        self._running = 0
+        self._lock = threading.Condition()
+        for _ in range(self.max_concurrent):
+            threading.Thread(target=self._serve, daemon=True).start()
+
+    def submit(self, data, anytime=False, dump=False, **options):
+        """Queue a solve_timetable (or, with anytime=True, solve_timetable_staged) call.
+
+        options are passed through, e.g. periods_per_day; num_workers is
+        set by the pool. dump=True keeps the model dump in job.dump.
+        """
+        if not anytime:
+            # Anytime solves are bounded by their stage time limits
+            options.setdefault("time_limit", self.time_limit)
+        key = hashlib.sha256(
+            json.dumps([data, options, anytime, dump], sort_keys=True, default=str).encode()
+        ).hexdigest()
+        with self._lock:
+            job = self._in_flight.get(key)
+            if job is not None:
+                job.subscribers += 1
+                return job
+            job = SolveJob(self, key, data, options, anytime, dump)
+            self._in_flight[key] = job
+            self._queue.append(job)
+            self._lock.notify()
+            return job
+
+    def position(self, job):
+        with self._lock:
+            if job.state != "queued":
+                return 0
+            return self._queue.index(job) + 1
+
+    def release(self, job):
+        with self._lock:
+            if job.subscribers == 0:
+                return
+            job.subscribers -= 1
+            if job.subscribers > 0:
+                return
+            if self._in_flight.get(job.key) is job:
+                del self._in_flight[job.key]
+            if job.state == "queued":
+                self._queue.remove(job)
+                job.state = "cancelled"
+                job.done = True
+                job._first.set()
+            else:
+                # Interrupts the running CP-SAT search
+                job._stop.set()
+
+    def stats(self):
+        """{"running": n, "queued": n} for a status line"""
+        with self._lock:
+            return {"running": self._running, "queued": len(self._queue)}
+
+    def _serve(self):
+        while True:
+            with self._lock:
+                while not self._queue:
+                    self._lock.wait()
+                job = self._queue.popleft()
+                job.state = "running"
+                self._running += 1
+            try:
+                job._run(self.workers_per_job)
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    if self._in_flight.get(job.key) is job:
+                        del self._in_flight[job.key]
+
+
+def pool_from_env():
+    """A SolverPool configured by TIMETABLE_MAX_SOLVES, TIMETABLE_SOLVER_THREADS and TIMETABLE_SOLVE_TIME_LIMIT"""
+    return SolverPool(
+        max_concurrent=int(os.environ.get("TIMETABLE_MAX_SOLVES", 0)) or None,
+        total_workers=int(os.environ.get("TIMETABLE_SOLVER_THREADS", 0)) or None,
+        time_limit=float(os.environ.get("TIMETABLE_SOLVE_TIME_LIMIT", 0)) or 60.0
+    )
@@ -0,0 +1,222 @@
+from collections import Counter, defaultdict
+
+from ortools.sat.python import cp_model
+
+from timetable_query import DAY_NAMES, TimetableIndex
+from timetable_solver import day_windows
+
+
+def _qualifications(data):
+    """teacher -> set of subjects they are listed for"""
+    qualified = defaultdict(set)
+    for t in data.get("teachers", []):
+        qualified[t["Teacher"]].add(t["Subject"].strip())
+    return qualified
+
+
+def _fixed_subjects(data):
+    """Subjects whose periods a swap must not move: option block subjects,
+    which hold a whole cohort, and subjects taught in block lessons"""
+    fixed = {subject for b in data.get("option_blocks", []) for subject in b["subjects"]}
+    for s in data.get("subjects", []):
+        if s.get("BlockSize", 1) > 1 and s.get("Blocks") != 0:
+            fixed.add(s["Subject"])
+    return fixed
+
+
+def _cohort_lessons(lessons):
+    """Group (class, subject) pairs of one slot into (subject, [class]): an
+    option block subject is one lesson for all the classes of its cohort"""
+    grouped = {}
+    for class_name, subject in lessons:
+        grouped.setdefault(subject, []).append(class_name)
+    return list(grouped.items())
+
+
+def _swap_day(index, absent, day, qualified, time_limit, fixed_subjects=(), max_run_length=2, min_spacing=None):
+    """Re-order the day's periods of the affected classes so that every
+    lesson of the absent teacher gets a free substitute.
+
+    Only the classes the absent teacher meets that day are moved; every
+    other class stays fixed and blocks its teachers' periods. Lessons of
+    fixed_subjects (option blocks and block lessons) stay where they are,
+    so cohorts and double periods are never split; the absent teacher's
+    ones are covered in place. The moved lessons keep the solver's
+    max_run_length and min_spacing windows within the day, and each
+    class keeps its lessons of the day, so per-day bounds hold as
+    before. The model first minimizes the lessons covered by unqualified
+    teachers, then leaves as many lessons where they were as it can.
+    """
+    ppd = index.periods_per_day
+    first = day * ppd
+    affected = sorted({c for p in range(ppd) for c, _ in index.teacher_slots[absent][first + p]})
+    affected_set = set(affected)
+
+    # Periods already taken by lessons outside the affected classes or of fixed subjects
+    fixed_busy = {
+        t: [
+            any(c not in affected_set or subject in fixed_subjects for c, subject in index.teacher_slots[t][first + p])
+            for p in range(ppd)
+        ]
+        for t in index.teachers
+    }
+    # Periods of the affected classes held by a fixed subject
+    in_block = {
+        c: [any(subject in fixed_subjects for subject in index.class_slots[c][first + p]) for p in range(ppd)]
+        for c in affected
+    }
+
+    # The solver's sliding windows, within this day
+    run_starts = day_windows(ppd, 1, max_run_length + 1) if max_run_length is not None else []
+    spacing = min(min_spacing or 1, ppd)
+    spacing_starts = day_windows(ppd, 1, spacing) if spacing > 1 else []
+
+    model = cp_model.CpModel()
+    place = {}  # (class, subject) -> one literal per period
+    for c in affected:
+        counts = Counter(
+            subject for p in range(ppd) if not in_block[c][p] for subject in index.class_slots[c][first + p]
+        )
+        for subject, n in counts.items():
+            row = place[c, subject] = [model.NewBoolVar("") for _ in range(ppd)]
+            model.Add(sum(row) == n)
+            for p in run_starts:
+                model.Add(sum(row[p:p + max_run_length + 1]) <= max_run_length)
+            for p in spacing_starts:
+                model.AddAtMostOne(row[p:p + spacing])
+        for p in range(ppd):
+            if in_block[c][p]:
+                model.Add(sum(place[c, subject][p] for subject in counts) == 0)
+            else:
+                model.AddAtMostOne(place[c, subject][p] for subject in counts)
+
+    cover = {}  # (class, subject, period) -> {substitute: literal}
+    unqualified = []
+    teacher_terms = defaultdict(list)
+
+    def add_cover(key, subject, p):
+        options = {}
+        for sub in index.teachers:
+            if sub != absent and not fixed_busy[sub][p]:
+                options[sub] = model.NewBoolVar("")
+                teacher_terms[sub, p].append(options[sub])
+                if subject not in qualified[sub]:
+                    unqualified.append(options[sub])
+        cover[key] = options
+        return options
+
+    # The absent teacher's fixed lessons: one cover each, in place
+    for p in range(ppd):
+        for subject, classes in _cohort_lessons(index.teacher_slots[absent][first + p]):
+            if subject in fixed_subjects:
+                model.Add(sum(add_cover((", ".join(classes), subject, p), subject, p).values()) == 1)
+    for (c, subject), literals in place.items():
+        teacher = index.teacher_of.get(subject)
+        for p in range(ppd):
+            if teacher == absent:
+                model.Add(sum(add_cover((c, subject, p), subject, p).values()) == literals[p])
+            # The absent teacher's lessons do not clash either, so the day stays a valid timetable
+            if teacher is not None:
+                if fixed_busy[teacher][p]:
+                    model.Add(literals[p] == 0)
+                else:
+                    teacher_terms[teacher, p].append(literals[p])
+
+    for literals in teacher_terms.values():
+        model.AddAtMostOne(literals)
+
+    # Qualified cover first, then as many lessons in their original period as possible
+    kept = sum(
+        literals[p] for (c, subject), literals in place.items() for p in range(ppd)
+        if subject in index.class_slots[c][first + p]
+    )
+    model.Maximize(kept - (len(affected) * ppd + 1) * sum(unqualified))
+
+    solver = cp_model.CpSolver()
+    solver.parameters.max_time_in_seconds = time_limit
+    status = solver.Solve(model)
+    if status != cp_model.OPTIMAL and status != cp_model.FEASIBLE:
+        return {"status": "fail", "message": f"No re-ordering of {DAY_NAMES[day]} leaves a free teacher for every lesson."}
+
+    day_timetable = {
+        c: [list(index.class_slots[c][first + p]) if in_block[c][p] else [] for p in range(ppd)] for c in affected
+    }
+    for (c, subject), literals in place.items():
+        for p in range(ppd):
+            if solver.Value(literals[p]):
+                day_timetable[c][p].append(subject)
+
+    moves = [
+        {"class": c, "period": p + 1, "before": index.class_slots[c][first + p], "after": day_timetable[c][p]}
+        for c in affected for p in range(ppd)
+        if index.class_slots[c][first + p] != day_timetable[c][p]
+    ]
+    assignments = [
+        {"class": c, "subject": subject, "period": p + 1, "substitute": sub, "qualified": subject in qualified[sub]}
+        for (c, subject, p), options in cover.items()
+        for sub, literal in options.items() if solver.Value(literal)
+    ]
+    return {
+        "status": "success",
+        "timetable": day_timetable,
+        "moves": moves,
+        "assignments": sorted(assignments, key=lambda a: (a["period"], a["class"]))
+    }
+
+
+def find_substitutes(result, data, teacher, day, index=None, time_limit=5.0, max_run_length=2, min_spacing=None):
+    """Cover options for teacher being absent on day (name or 0-based index).
+
+    Lists every lesson teacher has that day with the teachers free in
+    that slot, qualified ones first, then by lightest load that day and
+    that week; an option block lesson is listed once, with all of its
+    classes. If some lesson has no free qualified substitute, a small
+    CP-SAT model restricted to that day tries to swap the periods of
+    the affected classes so that qualified teachers cover as many lessons
+    as possible ("swap"). Pass the max_run_length and min_spacing the
+    timetable was solved with; the swap keeps to them.
+    """
+    if index is None:
+        index = TimetableIndex(result, data)
+    if isinstance(day, str):
+        day = DAY_NAMES.index(day.capitalize())
+    if teacher not in index.teacher_slots:
+        return {"status": "fail", "message": f"Teacher '{teacher}' does not teach any subject."}
+
+    qualified = _qualifications(data)
+    lessons = []
+    for period in range(1, index.periods_per_day + 1):
+        slot = index.slot(day, period)
+        for subject, classes in _cohort_lessons(index.teacher_at(teacher, slot)):
+            candidates = [
+                {
+                    "teacher": sub,
+                    "qualified": subject in qualified[sub],
+                    "day_load": index.teacher_daily_load(sub)[day],
+                    "week_load": sum(index.teacher_daily_load(sub))
+                }
+                for sub in index.free_teachers(slot) if sub != teacher
+            ]
+            candidates.sort(key=lambda c: (not c["qualified"], c["day_load"], c["week_load"], c["teacher"]))
+            lessons.append({
+                "slot": slot,
+                "period": period,
+                "class": ", ".join(classes),
+                "classes": classes,
+                "subject": subject,
+                "candidates": candidates
+            })
+
+    swap = None
+    if any(not lesson["candidates"] or not lesson["candidates"][0]["qualified"] for lesson in lessons):
+        swap = _swap_day(
+            index, teacher, day, qualified, time_limit, _fixed_subjects(data), max_run_length, min_spacing
+        )
+
+    return {
+        "status": "success",
+        "teacher": teacher,
+        "day": DAY_NAMES[day],
+        "lessons": lessons,
+        "swap": swap
+    }
@@ -1,8 +1,14 @@
 import streamlit as st
+import io
 import json
 import pandas as pd
-from ortools.sat.python import cp_model
-from collections import defaultdict
+from solver_pool import pool_from_env
+from scenario_sweep import run_sweep, sweep_table
+from instance_schema import validate_instance
+from timetable_export import export_timetables
+from timetable_query import TimetableIndex, DAY_NAMES
+from timetable_analytics import timetable_metrics, weekly_summary
+from substitution import find_substitutes
 
 # Import the conversion function from the first script
 def convert_csv_to_json(classes_file, subjects_file, teachers_file, output_file):
@@ -51,219 +57,6 @@ This tool generates optimal timetables considering:
 - Subject requirements
 """)
 
-def validate_json_data(data, periods_per_day):
-    errors = []
-    total_slots = 5 * periods_per_day  # 5 days per week
-    
-    # Check for required keys
-    for key in ["classes", "subjects", "teachers"]:
-        if key not in data:
-            errors.append(f"Missing key: '{key}' in JSON data.")
-
-    # Validate 'subjects'
-    subjects_defined = {}
-    if "subjects" in data:
-        if not isinstance(data["subjects"], list) or not data["subjects"]:
-            errors.append("The 'subjects' key must be a non-empty list.")
-        else:
-            for s in data["subjects"]:
-                if "Subject" not in s:
-                    errors.append("Each subject entry must have a 'Subject' field.")
-                if "Periods" not in s or not isinstance(s["Periods"], int):
-                    errors.append(f"Subject {s.get('Subject', '<unknown>')} must have an integer 'Periods' field.")
-                else:
-                    # Save subject details for later validations
-                    subjects_defined[s["Subject"]] = s["Periods"]
-                    # Check if the subject's periods exceed available slots for one class
-                    if s["Periods"] > total_slots:
-                        errors.append(f"Subject '{s.get('Subject', '<unknown>')}' requires {s['Periods']} periods, which exceeds the total available slots ({total_slots}).")
-
-    # Validate 'teachers'
-    if "teachers" in data:
-        if not isinstance(data["teachers"], list) or not data["teachers"]:
-            errors.append("The 'teachers' key must be a non-empty list.")
-        else:
-            for t in data["teachers"]:
-                if "Teacher" not in t:
-                    errors.append("Each teacher entry must have a 'Teacher' field.")
-                if "Subject" not in t:
-                    errors.append("Each teacher entry must have a 'Subject' field.")
-                else:
-                    subject = t["Subject"]
-                    # Check that the subject exists in the defined subjects
-                    if subject not in subjects_defined:
-                        errors.append(f"Teacher '{t.get('Teacher', '<unknown>')}' is assigned to subject '{subject}', which is not defined in subjects list.")
-
-    # Validate 'classes'
-    if "classes" in data:
-        if not isinstance(data["classes"], list) or not data["classes"]:
-            errors.append("The 'classes' key must be a non-empty list.")
-        else:
-            for c in data["classes"]:
-                if "class" not in c:
-                    errors.append("Each class entry must have a 'class' field.")
-                if "subjects" not in c or not isinstance(c["subjects"], list) or not c["subjects"]:
-                    errors.append(f"Class '{c.get('class', '<unknown>')}' must have a non-empty list of 'subjects'.")
-                else:
-                    class_total_periods = 0
-                    for subject in c["subjects"]:
-                        # Check that each subject in a class is defined
-                        if subject not in subjects_defined:
-                            errors.append(f"Subject '{subject}' in class '{c.get('class', '<unknown>')}' is not defined in the subjects list.")
-                        else:
-                            class_total_periods += subjects_defined[subject]
-                    # Check if total required periods for the class exceed available slots
-                    if class_total_periods > total_slots:
-                        errors.append(
-                            f"Total periods required for class '{c.get('class', '<unknown>')}' is {class_total_periods}, "
-                            f"which exceeds available slots ({total_slots})."
-                        )
-
-    return errors
-
-
-def solve_timetable(data, periods_per_day=8):
-    DAYS = 5  # Monday to Friday
-    SLOTS = DAYS * periods_per_day
-    classes = data.get("classes", [])
-    subjects = {s["Subject"]: s["Periods"] for s in data.get("subjects", [])}
-    teachers = {t["Subject"].strip(): t["Teacher"] for t in data.get("teachers", [])}
-
-    # Error checks
-    missing_teachers = [subject for subject in subjects if subject not in teachers]
-    if missing_teachers:
-        return {"status": "fail", "message": f"No teachers assigned for subjects: {', '.join(missing_teachers)}"}
-
-    if not classes:
-        return {"status": "fail", "message": "No classes defined in the input data."}
-
-    for class_info in classes:
-        if not class_info.get("subjects"):
-            return {"status": "fail", "message": f"Class {class_info['class']} has no subjects assigned."}
-
-    for subject, periods in subjects.items():
-        if periods > SLOTS:
-            return {"status": "fail", "message": f"Subject '{subject}' requires {periods} periods, but only {SLOTS} slots are available."}
-
-    # Create model
-    model = cp_model.CpModel()
-
-    # Variables: schedule[class][subject][slot]
-    schedule = {}
-    for c in classes:
-        class_name = c["class"]
-        schedule[class_name] = {}
-        for subject in c["subjects"]:
-            if subject not in subjects:
-                return {"status": "fail", "message": f"Subject '{subject}' in class '{class_name}' is not defined in subjects list."}
-            schedule[class_name][subject] = [
-                model.NewBoolVar(f"{class_name}_{subject}_slot{s}") for s in range(SLOTS)
-            ]
-
-    # Hard constraints
-    for c in classes:
-        class_name = c["class"]
-        for subject in c["subjects"]:
-            model.Add(sum(schedule[class_name][subject]) == subjects[subject])
-        
-        for s in range(SLOTS):
-            model.AddAtMostOne(schedule[class_name][subject][s] for subject in c["subjects"])
-
-        # NEW: Prevent 3 consecutive periods of the same subject
-        for s in range(SLOTS - 2):
-            for subject in c["subjects"]:
-                model.AddAtMostOne([
-                    schedule[class_name][subject][s],
-                    schedule[class_name][subject][s + 1],
-                    schedule[class_name][subject][s + 2]
-                ])
-
-    # Teacher conflicts
-    teacher_subjects = defaultdict(list)
-    for subject, teacher in teachers.items():
-        teacher_subjects[teacher].append(subject)
-
-    for teacher, subs in teacher_subjects.items():
-        for s in range(SLOTS):
-            model.AddAtMostOne(
-                schedule[c["class"]][subject][s]
-                for c in classes if subject in c["subjects"] and subject in subs
-            )
-
-    # Soft constraints
-    consecutive_penalties = []
-    other_penalties = []
-
-    for c in classes:
-        class_name = c["class"]
-
-        # 1. Penalty for consecutive same-subject periods (3x weight)
-        for s in range(SLOTS - 1):
-            for subject in c["subjects"]:
-                penalty = model.NewBoolVar(f"penalty_consec_{class_name}_{subject}_slot{s}")
-                model.AddBoolAnd([
-                    schedule[class_name][subject][s],
-                    schedule[class_name][subject][s + 1]
-                ]).OnlyEnforceIf(penalty)
-                consecutive_penalties.append(penalty)
-
-        # 2. Penalty for same period across days (1x weight)
-        for period in range(periods_per_day):
-            for subject in c["subjects"]:
-                daily_slots = [day * periods_per_day + period for day in range(DAYS)]
-                repeat_penalty = model.NewBoolVar(f"penalty_repeat_{class_name}_{subject}_period{period}")
-                model.Add(sum(schedule[class_name][subject][slot] for slot in daily_slots) > 1).OnlyEnforceIf(repeat_penalty)
-                other_penalties.append(repeat_penalty)
-
-    # Weighted objective
-    model.Minimize(3 * sum(consecutive_penalties) + sum(other_penalties))
-
-    # Solve
-    solver = cp_model.CpSolver()
-    status = solver.Solve(model)
-
-    if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
-        timetable = {}
-        free_periods = {}
-        actual_consecutives = 0
-        
-        for c in classes:
-            class_name = c["class"]
-            timetable[class_name] = {str(s): [] for s in range(SLOTS)}
-            
-            # Build timetable
-            for subject in c["subjects"]:
-                for s in range(SLOTS):
-                    if solver.Value(schedule[class_name][subject][s]):
-                        timetable[class_name][str(s)].append(subject)
-            
-            # Count actual consecutive periods
-            class_consecutives = 0
-            for s in range(SLOTS - 1):
-                current_slot = timetable[class_name][str(s)]
-                next_slot = timetable[class_name][str(s + 1)]
-                
-                if current_slot and next_slot and current_slot[0] == next_slot[0]:
-                    class_consecutives += 1
-            
-            actual_consecutives += class_consecutives
-            
-            # Count free periods
-            free_count = sum(1 for s in range(SLOTS) if not timetable[class_name][str(s)])
-            free_periods[class_name] = free_count
-        
-        return {
-            "status": "success",
-            "timetable": timetable,
-            "free_periods": free_periods,
-            "consecutive_repeats": actual_consecutives,
-            "solver_score": solver.ObjectiveValue(),
-            "periods_per_day": periods_per_day,
-            "classes": [c["class"] for c in classes]
-        }
-    else:
-        return {"status": "fail", "message": "No feasible solution. Try adjusting the constraints."}
-
 def get_timetable_data(timetable, class_name, periods_per_day):
     days = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
     periods = [f"Period {i+1}" for i in range(periods_per_day)]
@@ -279,13 +72,42 @@ def get_timetable_data(timetable, class_name, periods_per_day):
     
     return pd.DataFrame(data).set_index("Day")
 
+@st.cache_resource
+def get_solver_pool():
+    """One solver pool for every session of this server process"""
+    return pool_from_env()
+
+
+def release_solve_job():
+    """Leave the current solve; it stops unless another session shares it"""
+    if st.session_state.solve_job is not None:
+        st.session_state.solve_job.cancel()
+        st.session_state.solve_job = None
+
+
 # Main app logic
 if 'timetable_data' not in st.session_state:
     st.session_state.timetable_data = None
+if 'solve_job' not in st.session_state:
+    st.session_state.solve_job = None
+if 'sweep_runs' not in st.session_state:
+    st.session_state.sweep_runs = None
+if 'model_dump' not in st.session_state:
+    st.session_state.model_dump = None
+if 'timetable_input' not in st.session_state:
+    st.session_state.timetable_input = None
 
 with st.sidebar:
     st.header("Configuration")
     periods_per_day = st.number_input("Periods per day", min_value=1, max_value=12, value=8, help="Number of periods in each school day")
+    anytime_mode = st.checkbox("Anytime mode", value=True, help="Show a valid timetable within a second, then keep improving it in the background")
+    save_model_dump = st.checkbox("Save model dump", value=False, disabled=anytime_mode, help="Keep the CP-SAT model of the next solve for offline replay with replay_model.py")
+    pool = get_solver_pool()
+    pool_stats = pool.stats()
+    st.caption(
+        f"Solver pool: {pool_stats['running']}/{pool.max_concurrent} running, {pool_stats['queued']} queued, "
+        f"{pool.workers_per_job} threads per solve"
+    )
     
     # File uploaders for CSV files
     st.subheader("Upload CSV Files")
@@ -318,23 +140,120 @@ with st.sidebar:
                 "teachers": teachers_data
             }
             
-            validation_errors = validate_json_data(data, periods_per_day)
+            _, validation_errors = validate_instance(data, periods_per_day)
             if validation_errors:
                 for error in validation_errors:
-                    st.error(error)
+                    st.error(str(error))
             else:
                 if st.button("Generate Timetable"):
-                    with st.spinner("Generating optimal timetable..."):
-                        result = solve_timetable(data, periods_per_day=periods_per_day)
-                        st.session_state.timetable_data = result
-                        if result["status"] == "success":
-                            st.success("Timetable generated!")
-                        else:
-                            st.error(result["message"])
+                    # Stop any background improvement of the previous timetable
+                    release_solve_job()
+
+                    st.session_state.timetable_input = data
+                    st.session_state.timetable_data = None
+                    st.session_state.model_dump = None
+                    # Solves from every session share the pool's CPU budget
+                    st.session_state.solve_job = pool.submit(
+                        data,
+                        anytime=anytime_mode,
+                        dump=save_model_dump and not anytime_mode,
+                        periods_per_day=periods_per_day
+                    )
+
+                if st.session_state.model_dump:
+                    st.download_button(
+                        label="Download Model Dump",
+                        data=st.session_state.model_dump,
+                        file_name="timetable_model.zip",
+                        mime="application/zip"
+                    )
+
+                with st.expander("Scenario sweep"):
+                    sweep_periods = st.multiselect("Periods per day", list(range(1, 13)), default=[6, 7, 8])
+                    sweep_consecutive = st.multiselect("Consecutive penalty weight", [0, 1, 3, 5], default=[3])
+                    sweep_repeat = st.multiselect("Repeat penalty weight", [0, 1, 2], default=[1])
+                    sweep_run = st.multiselect(
+                        "Max periods in a row", [1, 2, 3, None], default=[2],
+                        format_func=lambda v: "No limit" if v is None else str(v)
+                    )
+                    sweep_spacing = st.multiselect(
+                        "Min spacing between periods", [None, 2, 3], default=[None],
+                        format_func=lambda v: "None" if v is None else str(v)
+                    )
+                    sweep_max_day = st.multiselect(
+                        "Max periods of a subject per day", [None, 1, 2, 3], default=[None],
+                        format_func=lambda v: "No limit" if v is None else str(v)
+                    )
+                    sweep_min_days = st.multiselect(
+                        "Spread each subject over at least", [None, 2, 3, 4, 5], default=[None],
+                        format_func=lambda v: "Any number of days" if v is None else f"{v} days"
+                    )
+                    sweep_teacher_day = st.multiselect(
+                        "Max periods a teacher teaches per day", [None, 4, 5, 6], default=[None],
+                        format_func=lambda v: "No limit" if v is None else str(v)
+                    )
+                    sweep_gap = st.multiselect("Teacher gap penalty weight", [0, 1, 2], default=[0])
+                    if st.button("Run Sweep"):
+                        grid = {
+                            "periods_per_day": sweep_periods,
+                            "consecutive_weight": sweep_consecutive,
+                            "repeat_weight": sweep_repeat,
+                            "max_run_length": sweep_run,
+                            "min_spacing": sweep_spacing,
+                            "max_per_day": sweep_max_day,
+                            "min_days": sweep_min_days,
+                            "teacher_max_per_day": sweep_teacher_day,
+                            "teacher_gap_weight": sweep_gap
+                        }
+                        with st.spinner("Solving all scenarios..."):
+                            # Queued with every other solve, so a sweep cannot take the whole machine
+                            st.session_state.sweep_runs = run_sweep(data, grid, pool=get_solver_pool())
+                            st.session_state.timetable_input = data
         except Exception as e:
             st.error(f"Error processing files: {str(e)}")
 
-# Display results (unchanged from original)
+@st.fragment(run_every=1.0)
+def poll_solve_job():
+    """Show the queue position, then swap in timetables from the pool as they arrive"""
+    job = st.session_state.solve_job
+    if job is None:
+        return
+    if job.latest is not None and job.latest is not st.session_state.timetable_data:
+        st.session_state.timetable_data = job.latest
+        st.rerun()
+    if job.done:
+        if job.dump is not None:
+            st.session_state.model_dump = job.dump
+        st.session_state.solve_job = None
+        st.rerun()
+
+    position = job.position
+    if position:
+        st.info(f"⏳ Waiting for a free solver: position {position} in the queue.")
+    elif job.latest is None:
+        st.info(f"⚙️ Generating timetable ({job.num_workers} solver threads)...")
+    else:
+        st.caption(f"⏳ Improving timetable in the background (stage {job.latest.get('stage', 0)})...")
+
+
+# Display results
+if st.session_state.sweep_runs:
+    st.subheader("Scenario Comparison")
+    st.dataframe(sweep_table(st.session_state.sweep_runs), use_container_width=True)
+
+    feasible_runs = [i for i, run in enumerate(st.session_state.sweep_runs) if run["result"]["status"] == "success"]
+    if feasible_runs:
+        inspect_idx = st.selectbox("Inspect scenario", feasible_runs, format_func=lambda i: f"#{i}")
+        if st.button("Show in Timetable Viewer"):
+            release_solve_job()
+            st.session_state.timetable_data = st.session_state.sweep_runs[inspect_idx]["result"]
+
+if st.session_state.solve_job is not None:
+    poll_solve_job()
+
+if st.session_state.timetable_data and st.session_state.timetable_data["status"] == "fail":
+    st.error(f"❌ Failed to generate timetable: {st.session_state.timetable_data['message']}")
+
 if st.session_state.timetable_data and st.session_state.timetable_data["status"] == "success":
     result = st.session_state.timetable_data
     
@@ -346,11 +265,50 @@ if st.session_state.timetable_data and st.session_state.timetable_data["status"]
         st.metric("Total Classes", len(result["classes"]))
     with col3:
         st.metric("Periods per Day", result["periods_per_day"])
+
+    if "stage" in result:
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Objective", "—" if result["solver_score"] is None else int(result["solver_score"]))
+        with col2:
+            st.metric("Proven Bound", "—" if result["best_bound"] is None else int(result["best_bound"]))
+        with col3:
+            st.metric("Status", "Optimal" if result["optimal"] else "Improving" if st.session_state.solve_job else "Best found")
     
-    # Free periods chart
-    st.subheader("Free Periods Distribution")
-    free_df = pd.DataFrame.from_dict(result["free_periods"], orient="index", columns=["Free Periods"])
-    st.bar_chart(free_df)
+    # Quality dashboard, computed once per result
+    if st.session_state.get("metrics_result") is not result:
+        st.session_state.timetable_metrics = timetable_metrics(result, st.session_state.timetable_input)
+        st.session_state.metrics_result = result
+    metrics = st.session_state.timetable_metrics
+    class_summary = weekly_summary(metrics, "class")
+    teacher_summary = weekly_summary(metrics, "teacher")
+
+    st.subheader("Quality Dashboard")
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Class Gaps", int(class_summary["gaps"].sum()))
+    with col2:
+        st.metric("Same-Period Repeats", int(class_summary["same_period_repeats"].sum()))
+    with col3:
+        st.metric("Teacher Gaps", int(teacher_summary["gaps"].sum()) if len(teacher_summary) else "—")
+    with col4:
+        daily_load = metrics[(metrics["kind"] == "teacher") & (metrics["metric"] == "load")]["value"]
+        st.metric("Busiest Teacher Day", int(daily_load.max()) if len(daily_load) else "—")
+
+    class_tab, teacher_tab = st.tabs(["Classes", "Teachers"])
+    for tab, kind, summary, label in (
+        (class_tab, "class", class_summary, "Classes"), (teacher_tab, "teacher", teacher_summary, "Teachers")
+    ):
+        with tab:
+            if not len(summary):
+                st.info("Load the instance data to see teacher metrics.")
+                continue
+            metric = st.selectbox("Metric", list(summary.columns), key=f"dashboard_{kind}_metric")
+            # Histogram: how many classes (or teachers) have each weekly value
+            histogram = summary[metric].value_counts().sort_index()
+            histogram.index.name = metric
+            st.bar_chart(histogram.rename(label))
+            st.dataframe(summary, use_container_width=True)
     
     # Class selector
     st.subheader("Timetable Viewer")
@@ -382,6 +340,79 @@ if st.session_state.timetable_data and st.session_state.timetable_data["status"]
         use_container_width=True
     )
     
+    # Lookups over the solved timetable, indexed once per result
+    if st.session_state.timetable_input is not None:
+        if st.session_state.get("index_result") is not result:
+            st.session_state.timetable_index = TimetableIndex(result, st.session_state.timetable_input)
+            st.session_state.index_result = result
+        index = st.session_state.timetable_index
+
+        st.subheader("Quick Lookups")
+        col1, col2 = st.columns(2)
+        with col1:
+            lookup_day = st.selectbox("Day", DAY_NAMES[:index.days_per_week], key="lookup_day")
+        with col2:
+            lookup_period = st.selectbox("Period", range(1, index.periods_per_day + 1), key="lookup_period")
+        lookup_slot = index.slot(lookup_day, lookup_period)
+
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.markdown("**Free teachers**")
+            st.write(", ".join(index.free_teachers(lookup_slot)) or "None")
+        with col2:
+            st.markdown(f"**{selected_class}**")
+            lessons = index.class_at(selected_class, lookup_slot)
+            st.write(", ".join(f"{subject} ({teacher})" for subject, teacher in lessons) or "Free")
+        with col3:
+            st.markdown("**Free classes**")
+            st.write(", ".join(index.free_classes(lookup_slot)) or "None")
+
+        lookup_teacher = st.selectbox("Teacher", index.teachers, key="lookup_teacher")
+        load_df = pd.DataFrame(
+            {"Periods": index.teacher_daily_load(lookup_teacher)},
+            index=DAY_NAMES[:index.days_per_week]
+        )
+        st.bar_chart(load_df)
+
+        st.subheader("Substitute Finder")
+        col1, col2 = st.columns(2)
+        with col1:
+            absent_teacher = st.selectbox("Absent teacher", index.teachers, key="absent_teacher")
+        with col2:
+            absent_day = st.selectbox("Day", DAY_NAMES[:index.days_per_week], key="absent_day")
+        if st.button("Find Substitutes"):
+            cover = find_substitutes(result, st.session_state.timetable_input, absent_teacher, absent_day, index=index)
+            if cover["status"] == "fail":
+                st.error(cover["message"])
+            elif not cover["lessons"]:
+                st.info(f"{absent_teacher} has no lessons on {absent_day}.")
+            else:
+                st.dataframe(pd.DataFrame([
+                    {
+                        "Period": lesson["period"],
+                        "Class": lesson["class"],
+                        "Subject": lesson["subject"],
+                        "Substitutes": ", ".join(
+                            f"{c['teacher']}{' ✓' if c['qualified'] else ''} ({c['day_load']} today)"
+                            for c in lesson["candidates"][:5]
+                        ) or "None free"
+                    }
+                    for lesson in cover["lessons"]
+                ]), use_container_width=True, hide_index=True)
+
+                swap = cover["swap"]
+                if swap is not None and swap["status"] == "success":
+                    st.markdown("**Suggested period swaps**")
+                    for move in swap["moves"]:
+                        st.write(f"{move['class']}, period {move['period']}: "
+                                 f"{', '.join(move['before']) or 'Free'} → {', '.join(move['after']) or 'Free'}")
+                    for assignment in swap["assignments"]:
+                        st.write(f"Period {assignment['period']}: {assignment['substitute']} covers "
+                                 f"{assignment['subject']} in {assignment['class']}"
+                                 f"{'' if assignment['qualified'] else ' (not qualified)'}")
+                elif swap is not None:
+                    st.warning(swap["message"])
+
     # Download buttons
     st.download_button(
         label="Download Timetable (JSON)",
@@ -397,8 +428,22 @@ if st.session_state.timetable_data and st.session_state.timetable_data["status"]
         mime="text/csv"
     )
 
-elif st.session_state.timetable_data and st.session_state.timetable_data["status"] == "fail":
-    st.error("❌ Failed to generate timetable. Please check your constraints.")
+    if st.session_state.timetable_input is not None and st.session_state.solve_job is not None:
+        st.caption("The bulk export (ZIP: CSV, XLSX, iCalendar) is available once the solve finishes.")
+    elif st.session_state.timetable_input is not None:
+        # Build the bulk export once per final result, not on every rerun
+        if st.session_state.get("export_result") is not result:
+            export = io.BytesIO()
+            export_timetables(result, st.session_state.timetable_input, export)
+            st.session_state.export_zip = export.getvalue()
+            st.session_state.export_result = result
+        st.download_button(
+            label="Download All Timetables (ZIP: CSV, XLSX, iCalendar)",
+            data=st.session_state.export_zip,
+            file_name="timetables.zip",
+            mime="application/zip"
+        )
+
 
 # Sample data
 # Sample data
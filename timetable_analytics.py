@@ -0,0 +1,175 @@
+import numpy as np
+import pandas as pd
+
+from timetable_query import DAY_NAMES
+from timetable_solver import block_pairs, block_sizes, idle_gaps
+
+# How per-day metrics combine into a weekly figure
+WEEKLY = {
+    "lessons": "sum",
+    "free_periods": "sum",
+    "gaps": "sum",
+    "consecutive_repeats": "sum",
+    "max_subject_periods": "max",
+    "load": "sum",
+    "clashes": "sum",
+}
+
+
+def class_matrix(result):
+    """(subjects, matrix): matrix[class, slot] indexes subjects, -1 for a free period.
+
+    Classes are in result["classes"] order. A slot of an option block
+    lists the block's subjects, which are one entry of subjects (a
+    tuple); any other entry is a subject name.
+    """
+    slots = result["periods_per_day"] * result.get("days_per_week", 5)
+    codes = {}
+    matrix = np.full((len(result["classes"]), slots), -1, dtype=np.int32)
+    for i, class_name in enumerate(result["classes"]):
+        for s, subjects in result["timetable"][class_name].items():
+            if subjects:
+                key = subjects[0] if len(subjects) == 1 else tuple(subjects)
+                matrix[i, int(s)] = codes.setdefault(key, len(codes))
+    return list(codes), matrix
+
+
+def teacher_matrix(subjects, matrix, data):
+    """(teachers, counts): counts[teacher, slot] is the number of lessons taught.
+
+    Subjects are taught by their last listed teacher, as in solve_timetable.
+    An option block is one lesson per teacher, however many of its
+    classes list it.
+    """
+    teacher_of = {t["Subject"].strip(): t["Teacher"] for t in data.get("teachers", [])}
+    teachers = sorted({t["Teacher"] for t in data.get("teachers", [])})
+    position = {teacher: i for i, teacher in enumerate(teachers)}
+    counts = np.zeros((len(teachers), matrix.shape[1]), dtype=np.int32)
+
+    # subject code -> teacher index, -1 for a subject nobody teaches or an option block
+    of_code = np.array(
+        [-1 if isinstance(subject, tuple) else position.get(teacher_of.get(subject), -1) for subject in subjects] + [-1],
+        dtype=np.int32
+    )
+    taught = of_code[matrix]  # -1 codes pick the trailing -1
+    rows, slots = np.nonzero(taught >= 0)
+    np.add.at(counts, (taught[rows, slots], slots), 1)
+
+    for code, block in enumerate(subjects):
+        if isinstance(block, tuple):
+            held = (matrix == code).any(axis=0)
+            for subject in block:
+                if teacher_of.get(subject) in position:
+                    counts[position[teacher_of[subject]]] += held
+    return teachers, counts
+
+
+def class_day_metrics(matrix, periods_per_day, block_codes=None):
+    """{metric: (classes, days) array} for a class_matrix.
+
+    block_codes ({subject code: block size}) excuses the pairs inside
+    block lessons from consecutive_repeats, as the solver does.
+    """
+    by_day = matrix.reshape(matrix.shape[0], -1, periods_per_day)
+    taught = by_day >= 0
+    # Periods of the same subject on the same day, for every period
+    same_day = (by_day[:, :, :, None] == by_day[:, :, None, :]).sum(axis=3)
+    repeats = ((by_day[:, :, 1:] == by_day[:, :, :-1]) & taught[:, :, 1:]).sum(axis=2)
+    for code, size in (block_codes or {}).items():
+        repeats -= block_pairs(by_day == code, size)
+    return {
+        "lessons": taught.sum(axis=2),
+        "free_periods": (~taught).sum(axis=2),
+        "gaps": idle_gaps(taught),
+        "consecutive_repeats": repeats,
+        "max_subject_periods": np.where(taught, same_day, 0).max(axis=2),
+    }
+
+
+def class_week_metrics(matrix, periods_per_day, num_subjects):
+    """{metric: (classes,) array}: same-period repetition and spread of subjects over days"""
+    rows = matrix.shape[0]
+    by_day = matrix.reshape(rows, -1, periods_per_day)
+
+    # A subject in the same period on several days: extra days per period
+    by_period = np.sort(by_day, axis=1)
+    same_period = ((by_period[:, 1:, :] == by_period[:, :-1, :]) & (by_period[:, 1:, :] >= 0)).sum(axis=(1, 2))
+
+    # Days each subject is taught on: count its first period of each day
+    earlier = np.tril(np.ones((periods_per_day, periods_per_day), dtype=bool), -1)
+    repeated = ((by_day[:, :, :, None] == by_day[:, :, None, :]) & earlier).any(axis=3)
+    first_of_day = (by_day >= 0) & ~repeated
+    class_ids = np.broadcast_to(np.arange(rows)[:, None, None], by_day.shape)
+    days = np.zeros((rows, num_subjects), dtype=np.int32)
+    np.add.at(days, (class_ids[first_of_day], by_day[first_of_day]), 1)
+    return {
+        "same_period_repeats": same_period,
+        # Fewest days any of the class's subjects is spread over
+        "min_subject_days": np.where(days > 0, days, by_day.shape[1]).min(axis=1, initial=by_day.shape[1]),
+    }
+
+
+def teacher_day_metrics(counts, periods_per_day):
+    """{metric: (teachers, days) array} for a teacher_matrix"""
+    by_day = counts.reshape(counts.shape[0], -1, periods_per_day)
+    return {
+        "load": by_day.sum(axis=2),
+        "gaps": idle_gaps(by_day > 0),
+        "clashes": np.maximum(by_day - 1, 0).sum(axis=2),
+    }
+
+
+def _tidy(kind, names, day_metrics, week_metrics, days_per_week):
+    """Long rows (kind, name, day, metric, value); weekly metrics have day "Week" """
+    frames = []
+    day_names = DAY_NAMES[:days_per_week]
+    for metric, values in day_metrics.items():
+        frames.append(pd.DataFrame({
+            "kind": kind,
+            "name": np.repeat(names, days_per_week),
+            "day": np.tile(day_names, len(names)),
+            "metric": metric,
+            "value": values.ravel(),
+        }))
+    for metric, values in week_metrics.items():
+        frames.append(pd.DataFrame({"kind": kind, "name": names, "day": "Week", "metric": metric, "value": values}))
+    return frames
+
+
+def timetable_metrics(result, data=None):
+    """Quality metrics of a solved timetable as a tidy DataFrame.
+
+    One row per (kind, name, day, metric), kind being "class" or
+    "teacher". Per-day metrics are listed per day name; weekly ones
+    (same_period_repeats, min_subject_days) have day "Week". Teacher rows
+    need the instance data the result was solved from, which also
+    keeps the pairs inside block lessons out of consecutive_repeats.
+    """
+    periods_per_day = result["periods_per_day"]
+    days_per_week = result.get("days_per_week", 5)
+    subjects, matrix = class_matrix(result)
+    sizes = block_sizes(data) if data is not None else {}
+    block_codes = {code: sizes[subject] for code, subject in enumerate(subjects) if subject in sizes}
+
+    week = class_week_metrics(matrix, periods_per_day, len(subjects))
+    day_metrics = class_day_metrics(matrix, periods_per_day, block_codes)
+    frames = _tidy("class", result["classes"], day_metrics, week, days_per_week)
+    if data is not None:
+        teachers, counts = teacher_matrix(subjects, matrix, data)
+        frames += _tidy("teacher", teachers, teacher_day_metrics(counts, periods_per_day), {}, days_per_week)
+    return pd.concat(frames, ignore_index=True)
+
+
+def weekly_summary(metrics, kind="class"):
+    """One row per class (or teacher), one column per metric, per-day metrics combined over the week"""
+    rows = metrics[metrics["kind"] == kind]
+    daily = rows[rows["day"] != "Week"]
+    table = daily.pivot_table(index="name", columns="metric", values="value", aggfunc="sum", sort=False)
+    for metric, how in WEEKLY.items():
+        if how != "sum" and metric in table:
+            table[metric] = daily[daily["metric"] == metric].groupby("name", sort=False)["value"].agg(how)
+    weekly = rows[rows["day"] == "Week"]
+    if len(weekly):
+        table = table.join(weekly.pivot(index="name", columns="metric", values="value"))
+    table.columns.name = None
+    return table
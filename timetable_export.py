@@ -0,0 +1,196 @@
+import argparse
+import csv
+import datetime
+import io
+import json
+import re
+import zipfile
+
+try:
+    import openpyxl
+except ImportError:  # the workbook is skipped without openpyxl
+    openpyxl = None
+
+DAY_NAMES = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+
+def _file_name(name, used):
+    # Unique within a folder (case-insensitively, for Windows), so no entry shadows another
+    base = re.sub(r'[\\/:*?"<>|]+', "_", str(name)).strip() or "_"
+    file_name, n = base, 1
+    while file_name.lower() in used:
+        n += 1
+        file_name = f"{base} ({n})"
+    used.add(file_name.lower())
+    return file_name
+
+
+def _sheet_name(name, used):
+    # Excel sheet names: at most 31 characters, no []:*?/\, unique
+    base = re.sub(r"[\[\]:*?/\\]+", "_", str(name))[:31] or "_"
+    sheet, n = base, 1
+    while sheet.lower() in used:
+        n += 1
+        suffix = f" ({n})"
+        sheet = base[:31 - len(suffix)] + suffix
+    used.add(sheet.lower())
+    return sheet
+
+
+def _write_csv(archive, path, rows):
+    with archive.open(path, "w") as raw, io.TextIOWrapper(raw, encoding="utf-8", newline="") as f:
+        csv.writer(f).writerows(rows)
+
+
+def _week_start(week_start):
+    if week_start is not None:
+        return week_start
+    # Next Monday, so the weekly events start on the first day of a school week
+    today = datetime.date.today()
+    return today + datetime.timedelta(days=(7 - today.weekday()) % 7 or 7)
+
+
+def _ics_text(text):
+    return str(text).replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+
+
+def _ics_fold(line):
+    """Fold a content line into lines of at most 75 octets (RFC 5545, 3.1)"""
+    encoded = line.encode("utf-8")
+    parts = []
+    start, limit = 0, 75
+    while len(encoded) - start > limit:
+        end = start + limit
+        # Do not split a UTF-8 sequence
+        while encoded[end] & 0xC0 == 0x80:
+            end -= 1
+        parts.append(encoded[start:end].decode("utf-8"))
+        # Continuation lines start with a space, which counts towards their 75
+        start, limit = end, 74
+    parts.append(encoded[start:].decode("utf-8"))
+    return "\r\n ".join(parts)
+
+
+def _ics_calendar(name, file_name, events, week_start, first_period, period_minutes, break_minutes):
+    """iCalendar text with one weekly recurring event per (slot, summary)"""
+    stamp = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    lines = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "PRODID:-//timetablesandbox//timetable export//EN",
+        f"X-WR-CALNAME:{_ics_text(name)}",
+    ]
+    for day, period, summary in events:
+        start = datetime.datetime.combine(week_start + datetime.timedelta(days=day), first_period)
+        start += datetime.timedelta(minutes=period * (period_minutes + break_minutes))
+        end = start + datetime.timedelta(minutes=period_minutes)
+        lines += [
+            "BEGIN:VEVENT",
+            f"UID:{file_name.replace(' ', '_')}-{day}-{period}-{len(lines)}@timetablesandbox",
+            f"DTSTAMP:{stamp}",
+            f"DTSTART:{start:%Y%m%dT%H%M%S}",
+            f"DTEND:{end:%Y%m%dT%H%M%S}",
+            "RRULE:FREQ=WEEKLY",
+            f"SUMMARY:{_ics_text(summary)}",
+            "END:VEVENT",
+        ]
+    lines.append("END:VCALENDAR")
+    return "\r\n".join(map(_ics_fold, lines)) + "\r\n"
+
+
+def export_timetables(result, data, path, week_start=None, first_period=datetime.time(8, 0),
+                      period_minutes=45, break_minutes=5, include_workbook=True):
+    """Write every class and teacher timetable of a solve_timetable result to a ZIP.
+
+    The archive holds classes/<class>.csv and .ics, teachers/<teacher>.csv
+    and .ics, and timetables.xlsx with one sheet per class and teacher
+    (when openpyxl is installed). Classes are written one at a time in a
+    single pass over the result; only the teacher grids, which are
+    filled along the way, are kept until the end. path may be a filename
+    or a writable binary file object.
+    """
+    periods_per_day = result["periods_per_day"]
+    days_per_week = result.get("days_per_week", 5)
+    week_start = _week_start(week_start)
+    ics_times = (week_start, first_period, period_minutes, break_minutes)
+
+    header = ["Day"] + [f"Period {i + 1}" for i in range(periods_per_day)]
+    teacher_of = {t["Subject"].strip(): t["Teacher"] for t in data.get("teachers", [])}
+    # teacher -> slot -> "Subject (Class)"
+    teacher_grids = {}
+    used_files = {"classes": set(), "teachers": set()}
+
+    workbook = None
+    if include_workbook and openpyxl is not None:
+        workbook = openpyxl.Workbook(write_only=True)
+        used_sheets = set()
+
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for class_name in result["classes"]:
+            slots = result["timetable"][class_name]
+            rows = [header]
+            events = []
+            for day in range(days_per_week):
+                row = [DAY_NAMES[day]]
+                for period in range(periods_per_day):
+                    slot = day * periods_per_day + period
+                    subjects = slots.get(str(slot), [])
+                    row.append(", ".join(subjects) if subjects else "Free")
+                    for subject in subjects:
+                        events.append((day, period, subject))
+                        teacher = teacher_of.get(subject)
+                        if teacher is not None:
+                            teacher_grids.setdefault(teacher, {}).setdefault(slot, []).append(f"{subject} ({class_name})")
+                rows.append(row)
+
+            file_name = _file_name(class_name, used_files["classes"])
+            _write_csv(archive, f"classes/{file_name}.csv", rows)
+            archive.writestr(f"classes/{file_name}.ics", _ics_calendar(class_name, file_name, events, *ics_times))
+            if workbook is not None:
+                sheet = workbook.create_sheet(_sheet_name(class_name, used_sheets))
+                for row in rows:
+                    sheet.append(row)
+
+        for teacher in sorted(teacher_grids):
+            grid = teacher_grids.pop(teacher)
+            rows = [header]
+            events = []
+            for day in range(days_per_week):
+                row = [DAY_NAMES[day]]
+                for period in range(periods_per_day):
+                    lessons = grid.get(day * periods_per_day + period, [])
+                    row.append(", ".join(lessons) if lessons else "Free")
+                    for lesson in lessons:
+                        events.append((day, period, lesson))
+                rows.append(row)
+
+            file_name = _file_name(teacher, used_files["teachers"])
+            _write_csv(archive, f"teachers/{file_name}.csv", rows)
+            archive.writestr(f"teachers/{file_name}.ics", _ics_calendar(teacher, f"teacher-{file_name}", events, *ics_times))
+            if workbook is not None:
+                sheet = workbook.create_sheet(_sheet_name(f"Teacher {teacher}", used_sheets))
+                for row in rows:
+                    sheet.append(row)
+
+        if workbook is not None:
+            with archive.open("timetables.xlsx", "w") as f:
+                workbook.save(f)
+
+
+if __name__ == "__main__":
+    from timetable_solver import solve_timetable
+
+    parser = argparse.ArgumentParser(description="Solve an instance and export every timetable to a ZIP.")
+    parser.add_argument("data", help="Instance JSON, e.g. data.json")
+    parser.add_argument("output", help="ZIP file to write")
+    parser.add_argument("--periods", type=int, default=8, help="Periods per day")
+    parser.add_argument("--days", type=int, default=5, help="Days per week")
+    args = parser.parse_args()
+
+    with open(args.data) as f:
+        data = json.load(f)
+    result = solve_timetable(data, periods_per_day=args.periods, days_per_week=args.days)
+    if result["status"] != "success":
+        raise SystemExit(result["message"])
+    export_timetables(result, data, args.output)
+    print(f"Timetables saved as {args.output}")
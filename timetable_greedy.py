@@ -0,0 +1,305 @@
+import time
+
+import numpy as np
+
+from timetable_solver import DAYS, extract_timetable, feasibility_errors, idle_gaps, solve_timetable, _setting_for
+
+# Options the constructor cannot honour; a standalone timetable built
+# while they are set would break them
+UNSUPPORTED = ("min_per_day", "min_days")
+
+
+class _Grid:
+    """The class x slot grid being filled, with the teacher occupancy beside it.
+
+    grid[i, s] is the position of the subject in class i's list, -1 when
+    free; owner[t, s] is the class teacher t teaches in slot s, -1 when free.
+    """
+
+    def __init__(self, num_classes, num_teachers, periods_per_day, days_per_week, rules):
+        self.slots = periods_per_day * days_per_week
+        self.periods_per_day = periods_per_day
+        self.days_per_week = days_per_week
+        self.grid = np.full((num_classes, self.slots), -1, dtype=np.int32)
+        self.owner = np.full((num_teachers, self.slots), -1, dtype=np.int32)
+        self.rules = rules
+
+    def place(self, i, j, t, s):
+        self.grid[i, s] = j
+        self.owner[t, s] = i
+
+    def remove(self, i, t, s):
+        self.grid[i, s] = -1
+        self.owner[t, s] = -1
+
+    def allowed(self, i, j, t, subject):
+        """Slots where subject j of class i may go, ignoring whether class i and teacher t are free"""
+        rules = self.rules
+        ppd = self.periods_per_day
+        row = (self.grid[i] == j).reshape(self.days_per_week, ppd)
+        ok = ~rules["unavailable"][t].reshape(self.days_per_week, ppd).copy()
+
+        # Runs: the periods in a row on either side of each slot, within the day
+        limit = rules["max_run_length"]
+        if limit is not None and limit < ppd:
+            left = np.zeros(row.shape, dtype=np.int32)
+            right = np.zeros(row.shape, dtype=np.int32)
+            for p in range(1, ppd):
+                left[:, p] = (left[:, p - 1] + 1) * row[:, p - 1]
+                right[:, ppd - 1 - p] = (right[:, ppd - p] + 1) * row[:, ppd - p]
+            ok &= left + right + 1 <= limit
+
+        # Spacing: no period of the subject within spacing - 1 periods
+        spacing = rules["spacing"]
+        for d in range(1, min(spacing, ppd)):
+            ok[:, d:] &= ~row[:, :-d]
+            ok[:, :-d] &= ~row[:, d:]
+
+        high = _setting_for(rules["max_per_day"], subject)
+        if high is not None:
+            ok &= (row.sum(axis=1) < high)[:, None]
+        cap = rules["teacher_caps"][t]
+        if cap is not None:
+            ok &= ((self.owner[t] >= 0).reshape(self.days_per_week, ppd).sum(axis=1) < cap)[:, None]
+        return ok.ravel()
+
+    def cost(self, i, j, t, weights, noise):
+        """Penalty added by placing subject j of class i, taught by teacher t, in each slot"""
+        row = self.grid[i] == j
+        adjacent = np.zeros(self.slots)
+        adjacent[1:] += row[:-1]
+        adjacent[:-1] += row[1:]
+        by_day = row.reshape(self.days_per_week, self.periods_per_day)
+        same_period = np.tile(by_day.any(axis=0), self.days_per_week)
+        same_day = np.repeat(by_day.sum(axis=1), self.periods_per_day)
+        # Spreading over days keeps later periods of the subject placeable
+        cost = weights[0] * adjacent + weights[1] * same_period + 0.5 * same_day + noise
+        if weights[2]:
+            # Idle periods the teacher would have, for each choice of slot
+            busy = self.owner[t] >= 0
+            trial = np.tile(busy, (self.slots, 1))
+            trial[np.arange(self.slots), np.arange(self.slots)] = True
+            shape = (self.slots, self.days_per_week, self.periods_per_day)
+            cost = cost + weights[2] * idle_gaps(trial.reshape(shape)).sum(axis=1)
+        return cost
+
+
+def _construct(data, periods_per_day, days_per_week, options, deadline, rng):
+    """One greedy pass with repair; returns (grid, unplaced, layout)"""
+    classes = data["classes"]
+    periods = {s["Subject"]: s["Periods"] for s in data["subjects"]}
+    teacher_of = {t["Subject"].strip(): t["Teacher"] for t in data["teachers"]}
+    teachers = sorted(set(teacher_of.values()))
+    position = {teacher: k for k, teacher in enumerate(teachers)}
+    slots = periods_per_day * days_per_week
+
+    unavailable = np.zeros((len(teachers), slots), dtype=bool)
+    for teacher, blocked in (options.get("teacher_unavailable") or {}).items():
+        if teacher in position:
+            unavailable[position[teacher], list(blocked)] = True
+    rules = {
+        "unavailable": unavailable,
+        "max_run_length": options.get("max_run_length", 2),
+        "spacing": options.get("min_spacing") or 1,
+        "max_per_day": options.get("max_per_day"),
+        "teacher_caps": [_setting_for(options.get("teacher_max_per_day"), teacher) for teacher in teachers],
+    }
+    weights = (options.get("consecutive_weight", 3), options.get("repeat_weight", 1), options.get("teacher_gap_weight", 0))
+    state = _Grid(len(classes), len(teachers), periods_per_day, days_per_week, rules)
+
+    # (class, subject position, teacher) of every lesson row
+    units = [(i, j, position[teacher_of[subject]]) for i, c in enumerate(classes) for j, subject in enumerate(c["subjects"])]
+    subject_of = [c["subjects"] for c in classes]
+
+    # Most constrained first: busiest teachers, then busiest classes, then longest rows
+    teacher_load = np.zeros(len(teachers))
+    class_load = np.zeros(len(classes))
+    for i, j, t in units:
+        teacher_load[t] += periods[subject_of[i][j]]
+        class_load[i] += periods[subject_of[i][j]]
+    capacity = np.maximum(slots - unavailable.sum(axis=1), 1)
+    tightness = [
+        (teacher_load[t] / capacity[t], class_load[i] / slots, periods[subject_of[i][j]], rng.random())
+        for i, j, t in units
+    ]
+    order = sorted(range(len(units)), key=lambda u: tightness[u], reverse=True)
+
+    def best_slot(i, j, t, exclude=None):
+        free = state.allowed(i, j, t, subject_of[i][j]) & (state.grid[i] < 0) & (state.owner[t] < 0)
+        if exclude is not None:
+            free[exclude] = False
+        if not free.any():
+            return None
+        cost = state.cost(i, j, t, weights, rng.random(slots) * 0.1)
+        return int(np.argmin(np.where(free, cost, np.inf)))
+
+    def repair(i, j, t):
+        """Place a period of (i, j) by moving the one or two lessons in its way"""
+        allowed = state.allowed(i, j, t, subject_of[i][j])
+        for s in np.flatnonzero(allowed):
+            blockers = set()
+            if state.grid[i, s] >= 0:
+                blockers.add((i, int(state.grid[i, s])))
+            if state.owner[t, s] >= 0:
+                other = int(state.owner[t, s])
+                blockers.add((other, int(state.grid[other, s])))
+            for bi, bj in blockers:
+                state.remove(bi, units_teacher[bi][bj], s)
+            state.place(i, j, t, s)
+            moved = []
+            for bi, bj in blockers:
+                target = best_slot(bi, bj, units_teacher[bi][bj], exclude=s)
+                if target is None:
+                    break
+                state.place(bi, bj, units_teacher[bi][bj], target)
+                moved.append((bi, bj, target))
+            else:
+                return True
+            # Undo
+            for bi, bj, target in moved:
+                state.remove(bi, units_teacher[bi][bj], target)
+            state.remove(i, t, s)
+            for bi, bj in blockers:
+                state.place(bi, bj, units_teacher[bi][bj], s)
+        return False
+
+    units_teacher = [[position[teacher_of[subject]] for subject in c["subjects"]] for c in classes]
+    unplaced = 0
+    for u in order:
+        i, j, t = units[u]
+        for _ in range(periods[subject_of[i][j]]):
+            s = best_slot(i, j, t)
+            if s is not None:
+                state.place(i, j, t, s)
+            elif time.monotonic() > deadline or not repair(i, j, t):
+                unplaced += 1
+
+    # Dense layout of a solution vector, as extract_timetable reads it
+    offsets = []
+    teacher_bases = {}
+    base = 0
+    for i, c in enumerate(classes):
+        offsets.append([base + j * slots for j in range(len(c["subjects"]))])
+        for j, subject in enumerate(c["subjects"]):
+            teacher_bases.setdefault(teacher_of[subject], []).append(offsets[i][j])
+        base += len(c["subjects"]) * slots
+    layout = {
+        "classes": classes,
+        "offsets": offsets,
+        "teacher_bases": teacher_bases,
+        "slots": slots,
+        "periods_per_day": periods_per_day,
+        "days_per_week": days_per_week,
+    }
+    return state.grid, unplaced, layout
+
+
+def _score(grid, periods_per_day, days_per_week, options, teacher_busy):
+    """The model's objective for a filled grid"""
+    consecutive = ((grid[:, 1:] == grid[:, :-1]) & (grid[:, 1:] >= 0)).sum()
+    # One penalty per (class, subject, period) taught in that period on two or more days
+    by_day = grid.reshape(len(grid), days_per_week, periods_per_day)
+    repeats = sum(((by_day == j).sum(axis=1) > 1).sum() for j in range(grid.max(initial=-1) + 1))
+    score = options.get("consecutive_weight", 3) * consecutive + options.get("repeat_weight", 1) * repeats
+    gap_weight = options.get("teacher_gap_weight", 0)
+    if gap_weight:
+        score += gap_weight * idle_gaps(teacher_busy.reshape(len(teacher_busy), days_per_week, periods_per_day)).sum()
+    return float(score)
+
+
+def _best_construction(data, periods_per_day, days_per_week, time_limit, seed, options):
+    """Restart the greedy pass with new tie-breaks until it places everything or time runs out"""
+    deadline = time.monotonic() + time_limit
+    rng = np.random.default_rng(seed)
+    best = None
+    while True:
+        grid, unplaced, layout = _construct(data, periods_per_day, days_per_week, options, deadline, rng)
+        solution = np.zeros(sum(len(c["subjects"]) for c in layout["classes"]) * layout["slots"], dtype=np.int8)
+        rows, slots = np.nonzero(grid >= 0)
+        solution[np.array([layout["offsets"][i][grid[i, s]] for i, s in zip(rows, slots)], dtype=int) + slots] = 1
+        teachers = list(layout["teacher_bases"])
+        busy = np.array([
+            solution[np.add.outer(np.asarray(layout["teacher_bases"][t]), np.arange(layout["slots"]))].any(axis=0)
+            for t in teachers
+        ]).reshape(len(teachers), -1)
+        score = _score(grid, periods_per_day, days_per_week, options, busy)
+        if best is None or (unplaced, score) < (best[1], best[2]):
+            best = (solution, unplaced, score, layout)
+        if best[1] == 0 or time.monotonic() > deadline:
+            return best
+
+
+def _unsupported(data, options):
+    """The settings of an instance the constructor would ignore"""
+    unsupported = [name for name in UNSUPPORTED if options.get(name)]
+    if any("BlockSize" in s or "Blocks" in s for s in data.get("subjects", [])):
+        unsupported.append("block lessons")
+    if data.get("option_blocks"):
+        unsupported.append("option blocks")
+    return unsupported
+
+
+def greedy_timetable(data, periods_per_day=8, days_per_week=DAYS, time_limit=1.0, seed=0, **model_options):
+    """Fast mode: a timetable from the constructive heuristic alone.
+
+    Fills the class x slot grid most-constrained lesson first, each period
+    in its cheapest allowed slot, and moves the lessons in the way when
+    none is left. Honours the period counts, one subject per slot,
+    teacher conflicts and unavailability, max_run_length, min_spacing,
+    max_per_day and teacher_max_per_day; block lessons, option blocks,
+    min_per_day and min_days are not supported. Restarts with new tie-breaks until every
+    period is placed or time_limit seconds pass.
+
+    Returns the same shape as solve_timetable, with "heuristic": True and
+    solver_score holding the model's objective for the timetable.
+    """
+    unsupported = _unsupported(data, model_options)
+    if unsupported:
+        return {"status": "fail", "message": f"The greedy constructor does not support {', '.join(unsupported)}."}
+    errors = feasibility_errors(data, periods_per_day, days_per_week)
+    if errors:
+        return {"status": "fail", "message": " ".join(errors)}
+
+    solution, unplaced, score, layout = _best_construction(
+        data, periods_per_day, days_per_week, time_limit, seed, model_options
+    )
+    if unplaced:
+        return {"status": "fail", "message": f"The greedy constructor could not place {unplaced} period(s) within {time_limit} seconds."}
+    result = extract_timetable(layout, solution, score)
+    result["heuristic"] = True
+    return result
+
+
+def greedy_hint(data, periods_per_day=8, days_per_week=DAYS, time_limit=1.0, seed=0, **model_options):
+    """A timetable to hint CP-SAT with; may leave periods unplaced, which the solver fills in"""
+    solution, _, score, layout = _best_construction(
+        data, periods_per_day, days_per_week, time_limit, seed, model_options
+    )
+    return extract_timetable(layout, solution, score)["timetable"]
+
+
+def solve_with_greedy_start(data, periods_per_day=8, time_limit=None, greedy_time=1.0, **options):
+    """solve_timetable warm-started from a greedy timetable.
+
+    The greedy timetable is returned instead (with "heuristic": True) if
+    it is complete and CP-SAT either finds nothing within time_limit or
+    finishes with a worse score. Instances with option blocks are solved
+    cold: the constructor has no rows for the blocks' cohorts.
+    """
+    if data.get("option_blocks"):
+        return solve_timetable(data, periods_per_day, time_limit=time_limit, **options)
+    days_per_week = options.get("days_per_week", DAYS)
+    model_options = {key: value for key, value in options.items() if key != "days_per_week"}
+    solution, unplaced, score, layout = _best_construction(
+        data, periods_per_day, days_per_week, greedy_time, 0, model_options
+    )
+    draft = extract_timetable(layout, solution, score)
+    result = solve_timetable(data, periods_per_day, time_limit=time_limit, hint=draft["timetable"], **options)
+
+    if unplaced or _unsupported(data, model_options):
+        return result
+    timed_out = result["status"] == "fail" and result.get("solver_status") == "UNKNOWN"
+    if timed_out or (result["status"] == "success" and score < result["solver_score"]):
+        draft["heuristic"] = True
+        return draft
+    return result
@@ -0,0 +1,97 @@
+DAY_NAMES = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+
+class TimetableIndex:
+    """Who/where/when lookups over a solved timetable.
+
+    Built once from a solve_timetable result and the instance data it was
+    solved from. The class, teacher and subject grids are indexed by
+    integer slot, so a lookup is a list access (O(1)) or proportional to
+    the size of its answer (O(k)) instead of a scan of the timetable.
+    Returned lists belong to the index and must not be modified.
+    """
+
+    def __init__(self, result, data):
+        self.periods_per_day = result["periods_per_day"]
+        self.days_per_week = result.get("days_per_week", 5)
+        self.slots = self.periods_per_day * self.days_per_week
+        self.classes = list(result["classes"])
+
+        # Subjects are taught by their last listed teacher, as in solve_timetable;
+        # teachers without a subject of their own are still on staff
+        teacher_of = {t["Subject"].strip(): t["Teacher"] for t in data.get("teachers", [])}
+        self.teacher_of = teacher_of
+        self.teachers = sorted({t["Teacher"] for t in data.get("teachers", [])})
+
+        # class -> slot -> [subject]
+        self.class_slots = {}
+        # teacher -> slot -> [(class, subject)]
+        self.teacher_slots = {teacher: [[] for _ in range(self.slots)] for teacher in self.teachers}
+        # subject -> slot -> [class]
+        self.subject_slots = {}
+        # slot -> {teacher}
+        self.busy_teachers = [set() for _ in range(self.slots)]
+        # teacher -> periods taught per day
+        self.teacher_load = {teacher: [0] * self.days_per_week for teacher in self.teachers}
+
+        for class_name in self.classes:
+            timetable = result["timetable"][class_name]
+            grid = [timetable.get(str(s), []) for s in range(self.slots)]
+            self.class_slots[class_name] = grid
+            for s, subjects in enumerate(grid):
+                for subject in subjects:
+                    self.subject_slots.setdefault(subject, [[] for _ in range(self.slots)])[s].append(class_name)
+                    teacher = teacher_of.get(subject)
+                    if teacher is not None:
+                        # An option block subject is one lesson for its whole cohort
+                        if not any(taught == subject for _, taught in self.teacher_slots[teacher][s]):
+                            self.teacher_load[teacher][s // self.periods_per_day] += 1
+                        self.teacher_slots[teacher][s].append((class_name, subject))
+                        self.busy_teachers[s].add(teacher)
+
+        # slot -> free teachers and classes, in teachers and classes order
+        self.free_teacher_slots = [[teacher for teacher in self.teachers if teacher not in busy] for busy in self.busy_teachers]
+        self.free_class_slots = [
+            [class_name for class_name in self.classes if not self.class_slots[class_name][s]] for s in range(self.slots)
+        ]
+
+    def slot(self, day, period):
+        """Slot number of a day (name or 0-based index) and 1-based period"""
+        if isinstance(day, str):
+            day = DAY_NAMES.index(day.capitalize())
+        if not 0 <= day < self.days_per_week or not 1 <= period <= self.periods_per_day:
+            raise ValueError(f"No slot for day {day}, period {period}.")
+        return day * self.periods_per_day + period - 1
+
+    def day_period(self, slot):
+        """(day name, 1-based period) of a slot"""
+        return DAY_NAMES[slot // self.periods_per_day], slot % self.periods_per_day + 1
+
+    def class_at(self, class_name, slot):
+        """Subjects class_name has in slot, with their teachers"""
+        return [(subject, self.teacher_of.get(subject)) for subject in self.class_slots[class_name][slot]]
+
+    def teacher_at(self, teacher, slot):
+        """(class, subject) pairs teacher teaches in slot"""
+        return self.teacher_slots[teacher][slot]
+
+    def classes_taking(self, subject, slot):
+        grid = self.subject_slots.get(subject)
+        return grid[slot] if grid is not None else []
+
+    def free_teachers(self, slot):
+        return self.free_teacher_slots[slot]
+
+    def free_classes(self, slot):
+        return self.free_class_slots[slot]
+
+    def teacher_daily_load(self, teacher):
+        """Periods taught per day, Monday first"""
+        return self.teacher_load[teacher]
+
+    def teacher_timetable(self, teacher):
+        """{(day name, period): ["Subject (Class)"]} of every taught slot"""
+        return {
+            self.day_period(s): [f"{subject} ({class_name})" for class_name, subject in lessons]
+            for s, lessons in enumerate(self.teacher_slots[teacher]) if lessons
+        }
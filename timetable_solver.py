@@ -0,0 +1,1209 @@
+import itertools
+import json
+import os
+import re
+import sys
+import threading
+import time
+import warnings
+import zipfile
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from ortools.sat.python import cp_model
+
+DAYS = 5  # Monday to Friday by default
+
+# Tuned CP-SAT parameters per instance size, written by tune_solver.py
+SOLVER_PROFILES = os.environ.get(
+    "TIMETABLE_SOLVER_PROFILES", os.path.join(os.path.dirname(os.path.abspath(__file__)), "solver_profiles.json")
+)
+
+
+def build_timetable_model(data, periods_per_day=8, days_per_week=DAYS, consecutive_weight=3,
+                          repeat_weight=1, max_run_length=2, min_spacing=None, max_per_day=None,
+                          min_per_day=None, min_days=None, teacher_unavailable=None,
+                          teacher_max_per_day=None, teacher_gap_weight=0, break_symmetry=True,
+                          lean=False, debug_names=False, report_memory=False, build_workers=None):
+    """Build the CP-SAT model for data.
+
+    Returns a dict with the model and its variables, or a fail result
+    (status "fail") when the input cannot be scheduled at all.
+
+    max_run_length caps the periods of one subject in a row and
+    min_spacing makes two periods of a subject on the same day at least
+    that many periods apart (2 rules out back-to-back lessons); None
+    turns either rule off. Both are checked within each day only.
+
+    max_per_day and min_per_day bound the periods of a subject on each
+    day and min_days spreads a subject over at least that many days (or
+    all of its periods, if it has fewer). Each
+    takes a number for every subject or a {subject: number} dict; None
+    (or a subject missing from the dict) leaves it unbounded.
+
+    A subject entry may ask for block lessons: "BlockSize": 2 teaches its
+    periods as double periods within one day, and "Blocks" sets how
+    many (4 periods with "Blocks": 1 are one double and two singles; a
+    single period never sits next to another period of its subject
+    unless both are in blocks).
+
+    teacher_unavailable ({teacher: [slot]}) keeps teachers free in the
+    given slots, e.g. while they teach at another school.
+
+    data["option_blocks"] lists electives taught in parallel to a cohort:
+    {"block": name, "classes": [class], "subjects": [subject]}. The
+    block's subjects have the same number of periods and are not in the
+    classes' own subject lists. Each block is one shared row of slot
+    variables, with the rules and penalties of a subject row (per-subject
+    settings are looked up by block name), and every teacher of its
+    subjects is busy in its slots. Its classes have none of their own
+    lessons then. built["option_blocks"] holds the blocks with the class
+    indices and the "base" of their row.
+
+    teacher_max_per_day caps the periods a teacher teaches on each day (a
+    number or a {teacher: number} dict) and teacher_gap_weight penalises
+    every idle period between a teacher's first and last lesson of a day.
+    Both work on one "busy" literal per teacher and slot.
+
+    Classes with the same subjects (and so the same teachers) are
+    interchangeable; break_symmetry=True orders each such group by the
+    first period of a shared subject, so the solver explores one of the
+    permuted copies of every timetable. The groups are in
+    built["symmetric_classes"].
+
+    The variable of slot s of the j-th subject of class i has proto index
+    offsets[i][j] + s, and variables[offsets[i][j] + s] is that variable.
+    The slot variables are created first and stored densely, unless
+    build_workers > 1: then the per-class constraints are built in that
+    many processes and merged, each class's variables in one run (the
+    other entries of variables are None). lean=True skips the nested
+    schedule dict and the variable names (kept with debug_names=True),
+    which dominate build time and memory on large instances.
+    report_memory=True adds "model_stats" with the build time and the
+    memory the model took.
+    """
+    args = (data, periods_per_day, days_per_week, consecutive_weight, repeat_weight,
+            max_run_length, min_spacing, max_per_day, min_per_day, min_days, teacher_unavailable,
+            teacher_max_per_day, teacher_gap_weight, break_symmetry, lean, debug_names, build_workers)
+    if not report_memory:
+        return _build_model(*args)
+
+    start_rss = _rss()
+    start_time = time.perf_counter()
+    built = _build_model(*args)
+    if built["status"] == "fail":
+        return built
+
+    proto = built["model"].Proto()
+    built["model_stats"] = {
+        "lean": lean,
+        "build_workers": build_workers or 1,
+        "variables": len(proto.variables),
+        "constraints": len(proto.constraints),
+        "build_seconds": time.perf_counter() - start_time,
+        # Includes the C++ model, which tracemalloc cannot see
+        "rss_growth_bytes": _rss() - start_rss
+    }
+    return built
+
+
+def _rss():
+    """Resident set size of this process in bytes.
+
+    Read from /proc on Linux; elsewhere the peak RSS stands in, which
+    only grows when the process reaches a new peak.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:  # Windows
+        return 0
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def day_windows(periods_per_day, days_per_week, length):
+    """First slot of every run of length periods that stays within one day"""
+    return [
+        day * periods_per_day + period
+        for day in range(days_per_week) for period in range(periods_per_day - length + 1)
+    ]
+
+
+def _setting_for(setting, name):
+    """A build setting's value for a subject or teacher: the number itself or its dict entry"""
+    if isinstance(setting, dict):
+        return setting.get(name)
+    return setting
+
+
+def equivalent_classes(classes, teachers, option_blocks=()):
+    """Groups (lists of class indices) of two or more interchangeable classes.
+
+    Classes are interchangeable when they take the same multiset of
+    subjects from the same teachers and are in the same option blocks.
+    """
+    cohorts = defaultdict(list)
+    for b in option_blocks:
+        for i in b["classes"]:
+            cohorts[i].append(b["block"])
+    groups = defaultdict(list)
+    for i, c in enumerate(classes):
+        lessons = tuple(sorted((subject, teachers.get(subject)) for subject in c["subjects"]))
+        groups[(lessons, tuple(sorted(cohorts[i])))].append(i)
+    return [group for group in groups.values() if len(group) > 1]
+
+
+def _add_class(model, c, rows, rules):
+    """Add the constraints and penalties of one class to model.
+
+    rows[j] holds the slot variables of the class's j-th subject. Returns
+    the class's (consecutive, repeat) penalty literals. Only the class's
+    own variables are used, so classes can be added in any model shard.
+    """
+    new_bool = model.NewBoolVar
+    SLOTS = rules["slots"]
+    periods_per_day = rules["periods_per_day"]
+    days_per_week = rules["days_per_week"]
+    subjects = rules["subjects"]
+    blocks = rules["blocks"]
+    names = rules["names"]
+    class_name = c["class"]
+
+    # Hard constraints
+    for subject, row in zip(c["subjects"], rows):
+        model.Add(cp_model.LinearExpr.Sum(row) == subjects[subject])
+
+    # Classes in option blocks get this from _build_model, together with their blocks' rows
+    if class_name not in rules["option_classes"]:
+        for s in range(SLOTS):
+            model.AddAtMostOne([row[s] for row in rows])
+
+    # One constraint per window
+    spacing = rules["spacing"]
+    for subject, row in zip(c["subjects"], rows):
+        if subject in rules["run_limits"]:
+            limit, run_starts = rules["run_limits"][subject]
+            for s in run_starts:
+                window = row[s:s + limit + 1]
+                if limit == 1:
+                    model.AddAtMostOne(window)
+                else:
+                    model.Add(cp_model.LinearExpr.Sum(window) <= limit)
+        if subject not in blocks:
+            for s in rules["spacing_starts"]:
+                model.AddAtMostOne(row[s:s + spacing])
+
+    # Blocks: one start literal per possible start within a day. A slot
+    # covered by a started block is taught; the other taught slots of
+    # the subject are its single periods.
+    # block_starts[subject][slot]: the start literals of the blocks covering slot
+    block_starts = {}
+    for subject, row in zip(c["subjects"], rows):
+        if subject not in blocks:
+            continue
+        size, count = blocks[subject]
+        block_slots = rules["block_slots"][subject]
+        starts = [new_bool(f"block_{class_name}_{subject}_slot{s}" if names else "") for s in block_slots]
+        model.Add(cp_model.LinearExpr.Sum(starts) == count)
+        covering = [[] for _ in range(SLOTS)]
+        for s, start in zip(block_slots, starts):
+            for t in range(s, s + size):
+                covering[t].append(start)
+        singles = subjects[subject] - size * count
+        for t, cover in enumerate(covering):
+            if singles == 0:
+                model.Add(row[t] == cp_model.LinearExpr.Sum(cover))
+            elif cover:
+                model.Add(row[t] >= cp_model.LinearExpr.Sum(cover))
+        if singles:
+            # Two adjacent periods of the day are both in blocks, so
+            # singles cannot join each other or a block into a longer run
+            for t in range(SLOTS - 1):
+                if (t + 1) % periods_per_day:
+                    model.AddBoolOr([row[t].Not(), row[t + 1].Not()] + covering[t])
+                    model.AddBoolOr([row[t].Not(), row[t + 1].Not()] + covering[t + 1])
+        block_starts[subject] = covering
+
+    # Per-day spread: one sum per (class, subject, day) and bound
+    for subject, row in zip(c["subjects"], rows):
+        if subject not in rules["day_bounds"]:
+            continue
+        low, high, days = rules["day_bounds"][subject]
+        by_day = [row[day * periods_per_day:(day + 1) * periods_per_day] for day in range(days_per_week)]
+        for day_vars in by_day:
+            if high == 1:
+                model.AddAtMostOne(day_vars)
+            elif high < periods_per_day:
+                model.Add(cp_model.LinearExpr.Sum(day_vars) <= high)
+            if low > 0:
+                model.Add(cp_model.LinearExpr.Sum(day_vars) >= low)
+        # Taught on at least `days` days <=> any days_per_week - days + 1
+        # days hold a period; these clauses propagate better than day counters
+        if days > 1 and low == 0:
+            for free_days in itertools.combinations(by_day, days_per_week - days + 1):
+                model.AddBoolOr([var for day_vars in free_days for var in day_vars])
+
+    # Soft constraints
+    consecutive_penalties = []
+    repeat_penalties = []
+
+    # 1. Penalty for consecutive same-subject periods (3x weight by default)
+    for s in range(SLOTS - 1):
+        for subject, row in zip(c["subjects"], rows):
+            penalty = new_bool(f"penalty_consec_{class_name}_{subject}_slot{s}" if names else "")
+            # Both periods taken forces the penalty on, unless one block covers both
+            clause = [row[s].Not(), row[s + 1].Not(), penalty]
+            if subject in blocks:
+                covering = block_starts[subject]
+                next_starts = {start.Index() for start in covering[s + 1]}
+                clause += [start for start in covering[s] if start.Index() in next_starts]
+            model.AddBoolOr(clause)
+            consecutive_penalties.append(penalty)
+
+    # 2. Penalty for same period across days (1x weight by default)
+    for period in range(periods_per_day):
+        for subject, row in zip(c["subjects"], rows):
+            repeat_penalty = new_bool(f"penalty_repeat_{class_name}_{subject}_period{period}" if names else "")
+            model.Add(cp_model.LinearExpr.Sum(row[period::periods_per_day]) <= 1).OnlyEnforceIf(repeat_penalty.Not())
+            repeat_penalties.append(repeat_penalty)
+
+    return consecutive_penalties, repeat_penalties
+
+
+def _class_variable_count(c, rules):
+    """Variables _add_class and its slot rows create for class c"""
+    per_subject = rules["slots"] + rules["slots"] - 1 + rules["periods_per_day"]
+    starts = sum(len(rules["block_slots"][subject]) for subject in c["subjects"] if subject in rules["blocks"])
+    return per_subject * len(c["subjects"]) + starts
+
+
+# Proto indices in the text format of a model: the lines listing variables
+# or literals (negative literals are -index - 1)
+_INDEX_LINE = re.compile(r"^(\s*(?:vars|literals|enforcement_literal): )(-?\d+)$", re.MULTILINE)
+
+
+def _build_shard(classes, rules, consecutive_weight, repeat_weight, first):
+    """Build the per-class part of the model for a run of classes.
+
+    Each class's slot rows come first, then the variables _add_class
+    creates. Returns the shard in text format with its indices shifted by
+    first, its index in the merged model, and the class offsets.
+    """
+    SLOTS = rules["slots"]
+    model = cp_model.CpModel()
+    names = rules["names"]
+    offsets = []
+    consecutive_penalties = []
+    repeat_penalties = []
+    for c in classes:
+        start = len(model.Proto().variables)
+        rows = [
+            [model.NewBoolVar(f"{c['class']}_{subject}_slot{s}" if names else "") for s in range(SLOTS)]
+            for subject in c["subjects"]
+        ]
+        offsets.append([first + row[0].Index() for row in rows])
+        consecutive, repeats = _add_class(model, c, rows, rules)
+        consecutive_penalties += consecutive
+        repeat_penalties += repeats
+        if len(model.Proto().variables) - start != _class_variable_count(c, rules):
+            raise RuntimeError(f"Class '{c['class']}' does not match its variable count.")
+    model.Minimize(
+        consecutive_weight * cp_model.LinearExpr.Sum(consecutive_penalties)
+        + repeat_weight * cp_model.LinearExpr.Sum(repeat_penalties)
+    )
+
+    def shift(match):
+        index = int(match[2])
+        return f"{match[1]}{index + first if index >= 0 else index - first}"
+
+    return _INDEX_LINE.sub(shift, str(model.Proto())), offsets
+
+
+def _build_sharded(model, classes, rules, consecutive_weight, repeat_weight, build_workers):
+    """Build the per-class constraints in build_workers processes and merge them into model.
+
+    Each worker builds a run of classes as its own model, with indices
+    shifted to the run's place in the merged model, so merging is a
+    concatenation of text-format protos (repeated fields, including the
+    objective terms, append). Returns (variables, offsets) as
+    _build_model lays them out; variables holds None at the indices of
+    the shards' auxiliary variables.
+    """
+    counts = [_class_variable_count(c, rules) for c in classes]
+    shard_size = -(-len(classes) // build_workers)
+    shards = []
+    first = 0
+    for start in range(0, len(classes), shard_size):
+        shards.append((classes[start:start + shard_size], first))
+        first += sum(counts[start:start + shard_size])
+
+    with ProcessPoolExecutor(max_workers=min(build_workers, len(shards))) as pool:
+        futures = [
+            pool.submit(_build_shard, shard, rules, consecutive_weight, repeat_weight, shard_first)
+            for shard, shard_first in shards
+        ]
+        offsets = []
+        proto = model.Proto()
+        for future in futures:
+            text, shard_offsets = future.result()
+            proto.merge_text_format(text)
+            offsets += shard_offsets
+
+    variables = [None] * first
+    get_var = model.GetBoolVarFromProtoIndex
+    for class_offsets in offsets:
+        for base in class_offsets:
+            variables[base:base + rules["slots"]] = [get_var(i) for i in range(base, base + rules["slots"])]
+    return variables, offsets
+
+
+def _build_model(data, periods_per_day, days_per_week, consecutive_weight, repeat_weight,
+                 max_run_length, min_spacing, max_per_day, min_per_day, min_days, teacher_unavailable,
+                 teacher_max_per_day, teacher_gap_weight, break_symmetry, lean, debug_names, build_workers):
+    SLOTS = days_per_week * periods_per_day
+    classes = data.get("classes", [])
+    subjects = {s["Subject"]: s["Periods"] for s in data.get("subjects", [])}
+    teachers = {t["Subject"].strip(): t["Teacher"] for t in data.get("teachers", [])}
+    names = debug_names or not lean
+
+    # Error checks
+    missing_teachers = [subject for subject in subjects if subject not in teachers]
+    if missing_teachers:
+        return {"status": "fail", "message": f"No teachers assigned for subjects: {', '.join(missing_teachers)}"}
+
+    if not classes:
+        return {"status": "fail", "message": "No classes defined in the input data."}
+
+    for class_info in classes:
+        if not class_info.get("subjects"):
+            return {"status": "fail", "message": f"Class {class_info['class']} has no subjects assigned."}
+
+    for subject, periods in subjects.items():
+        if periods > SLOTS:
+            return {"status": "fail", "message": f"Subject '{subject}' requires {periods} periods, but only {SLOTS} slots are available."}
+
+    for c in classes:
+        for subject in c["subjects"]:
+            if subject not in subjects:
+                return {"status": "fail", "message": f"Subject '{subject}' in class '{c['class']}' is not defined in subjects list."}
+
+    # Option blocks, with their classes as indices
+    class_index = {c["class"]: i for i, c in enumerate(classes)}
+    option_blocks = []
+    for b in data.get("option_blocks", []):
+        name = b["block"]
+        if name in subjects or name in class_index:
+            return {"status": "fail", "message": f"Option block '{name}' has the name of a subject or class."}
+        if any(name == other["block"] for other in option_blocks):
+            return {"status": "fail", "message": f"Option block '{name}' is defined twice."}
+        if len(set(b["classes"])) < len(b["classes"]):
+            return {"status": "fail", "message": f"Option block '{name}' lists a class twice."}
+        for class_name in b["classes"]:
+            if class_name not in class_index:
+                return {"status": "fail", "message": f"Class '{class_name}' in option block '{name}' is not defined in classes list."}
+            both = set(b["subjects"]).intersection(classes[class_index[class_name]]["subjects"])
+            if both:
+                return {"status": "fail", "message": f"Class '{class_name}' takes {', '.join(sorted(both))} in option block '{name}' and in its own subjects."}
+        for subject in b["subjects"]:
+            if subject not in subjects:
+                return {"status": "fail", "message": f"Subject '{subject}' in option block '{name}' is not defined in subjects list."}
+        periods = {subjects[subject] for subject in b["subjects"]}
+        if len(periods) != 1:
+            return {"status": "fail", "message": f"The subjects of option block '{name}' have different numbers of periods."}
+        block_teachers = [teachers[subject] for subject in b["subjects"]]
+        if len(set(block_teachers)) < len(block_teachers):
+            return {"status": "fail", "message": f"Option block '{name}' has two subjects taught by the same teacher."}
+        option_blocks.append({
+            "block": name,
+            "classes": [class_index[class_name] for class_name in b["classes"]],
+            "subjects": list(b["subjects"]),
+            "periods": periods.pop()
+        })
+    # A block's row is scheduled like a subject of that name
+    subjects.update({b["block"]: b["periods"] for b in option_blocks})
+
+    # Block lessons: subject -> (block size, number of blocks); the rest are single periods
+    blocks = {}
+    for s in data.get("subjects", []):
+        size = s.get("BlockSize", 1)
+        count = s.get("Blocks")
+        if type(size) is not int or not (count is None or type(count) is int and count >= 0):
+            return {"status": "fail", "message": f"Subject '{s['Subject']}' needs a whole number BlockSize and a non-negative whole number of Blocks."}
+        if size == 1 and not count:
+            continue
+        if not 1 <= size <= periods_per_day:
+            return {"status": "fail", "message": f"Subject '{s['Subject']}' has blocks of {size} periods, but a day has {periods_per_day} periods."}
+        if count is None:
+            count = s["Periods"] // size
+        if count * size > s["Periods"]:
+            return {"status": "fail", "message": f"Subject '{s['Subject']}' has {count} blocks of {size} periods, more than its {s['Periods']} periods."}
+        if count and size > 1:
+            blocks[s["Subject"]] = (size, count)
+
+    # Per-day bounds of each subject: (min periods, max periods, min days)
+    day_bounds = {}
+    for subject, periods in subjects.items():
+        low = _setting_for(min_per_day, subject) or 0
+        high = _setting_for(max_per_day, subject)
+        high = periods_per_day if high is None else min(high, periods_per_day)
+        # A subject with fewer periods than min_days is spread over all of them
+        days = min(_setting_for(min_days, subject) or 0, periods)
+        if low * days_per_week > periods or high * days_per_week < periods:
+            return {"status": "fail", "message": f"Subject '{subject}' requires {periods} periods, which cannot be split into {low} to {high} periods per day."}
+        if days > days_per_week:
+            return {"status": "fail", "message": f"Subject '{subject}' cannot be spread over {days} days in a {days_per_week}-day week."}
+        if subject in blocks and blocks[subject][0] > high:
+            return {"status": "fail", "message": f"Subject '{subject}' has blocks of {blocks[subject][0]} periods, but at most {high} periods per day."}
+        if low > 0 or high < periods_per_day or days > 1:
+            day_bounds[subject] = (low, high, days)
+
+    if teacher_max_per_day is not None:
+        teacher_periods = defaultdict(int)
+        for c in classes:
+            for subject in c["subjects"]:
+                teacher_periods[teachers[subject]] += subjects[subject]
+        for b in option_blocks:
+            for subject in b["subjects"]:
+                teacher_periods[teachers[subject]] += b["periods"]
+        for teacher, periods in teacher_periods.items():
+            cap = _setting_for(teacher_max_per_day, teacher)
+            if cap is not None and cap * days_per_week < periods:
+                return {"status": "fail", "message": f"Teacher '{teacher}' teaches {periods} periods, more than {cap} per day allows."}
+
+    if max_run_length is not None and max_run_length < 1:
+        return {"status": "fail", "message": "Maximum run length must be at least 1 period."}
+    if min_spacing is not None and min_spacing < 1:
+        return {"status": "fail", "message": "Minimum spacing must be at least 1 period."}
+
+    # Sliding windows within each day: at most max_run_length of any
+    # max_run_length + 1 periods in a row, at most one of any min_spacing.
+    # A block may run longer than max_run_length, and spacing does not
+    # apply to block subjects, whose periods are back-to-back by design.
+    run_limits = {}
+    if max_run_length is not None:
+        for subject in subjects:
+            limit = max(max_run_length, blocks[subject][0]) if subject in blocks else max_run_length
+            if limit < periods_per_day:
+                run_limits[subject] = (limit, day_windows(periods_per_day, days_per_week, limit + 1))
+    spacing = min(min_spacing or 1, periods_per_day)
+
+    # Everything the per-class constraints need, picklable for build workers
+    rules = {
+        "slots": SLOTS,
+        "periods_per_day": periods_per_day,
+        "days_per_week": days_per_week,
+        "subjects": subjects,
+        "blocks": blocks,
+        "block_slots": {subject: day_windows(periods_per_day, days_per_week, size) for subject, (size, _) in blocks.items()},
+        "run_limits": run_limits,
+        "spacing": spacing,
+        "spacing_starts": day_windows(periods_per_day, days_per_week, spacing) if spacing > 1 else [],
+        "day_bounds": day_bounds,
+        "option_classes": {classes[i]["class"] for b in option_blocks for i in b["classes"]},
+        "names": names
+    }
+
+    # Create model
+    model = cp_model.CpModel()
+    new_bool = model.NewBoolVar
+
+    # Variables: variables[offsets[class_id][subject_id] + slot]
+    consecutive_penalties = []
+    other_penalties = []
+    sharded = build_workers is not None and build_workers > 1 and len(classes) > 1
+    if sharded:
+        # The shards' penalties arrive in the merged objective
+        variables, offsets = _build_sharded(model, classes, rules, consecutive_weight, repeat_weight, build_workers)
+    else:
+        variables = []
+        offsets = []
+        for c in classes:
+            class_name = c["class"]
+            class_offsets = []
+            for subject in c["subjects"]:
+                class_offsets.append(len(variables))
+                if names:
+                    variables.extend(new_bool(f"{class_name}_{subject}_slot{s}") for s in range(SLOTS))
+                else:
+                    variables.extend(new_bool("") for _ in range(SLOTS))
+            offsets.append(class_offsets)
+
+    # Option block rows, right after the class rows
+    for b in option_blocks:
+        b["base"] = len(variables)
+        variables.extend(new_bool(f"{b['block']}_slot{s}" if names else "") for s in range(SLOTS))
+
+    if not sharded:
+        for c, class_offsets in zip(classes, offsets):
+            rows = [variables[base:base + SLOTS] for base in class_offsets]
+            consecutive, repeats = _add_class(model, c, rows, rules)
+            consecutive_penalties += consecutive
+            other_penalties += repeats
+
+    # An option block is added like a class with the block as its one subject;
+    # its classes take at most one of their lessons and blocks per slot
+    class_blocks = defaultdict(list)
+    for b in option_blocks:
+        row = variables[b["base"]:b["base"] + SLOTS]
+        consecutive, repeats = _add_class(model, {"class": b["block"], "subjects": [b["block"]]}, [row], rules)
+        consecutive_penalties += consecutive
+        other_penalties += repeats
+        for i in b["classes"]:
+            class_blocks[i].append(b["base"])
+    for i, block_bases in class_blocks.items():
+        bases = offsets[i] + block_bases
+        for s in range(SLOTS):
+            model.AddAtMostOne([variables[base + s] for base in bases])
+
+    teacher_bases = defaultdict(list)
+    for c, class_offsets in zip(classes, offsets):
+        for subject, base in zip(c["subjects"], class_offsets):
+            teacher_bases[teachers[subject]].append(base)
+    for b in option_blocks:
+        for subject in b["subjects"]:
+            teacher_bases[teachers[subject]].append(b["base"])
+
+    # Teacher conflicts. Teachers with a day-shape rule get busy[teacher][s],
+    # true iff they teach in slot s: exactly one of their lessons in s or
+    # "not busy" holds, which is the conflict constraint and the definition
+    busy = {}
+    for teacher, bases in teacher_bases.items():
+        if not teacher_gap_weight and _setting_for(teacher_max_per_day, teacher) is None:
+            for s in range(SLOTS):
+                model.AddAtMostOne([variables[base + s] for base in bases])
+        elif len(bases) == 1:
+            busy[teacher] = variables[bases[0]:bases[0] + SLOTS]
+        else:
+            busy[teacher] = [new_bool(f"busy_{teacher}_slot{s}" if names else "") for s in range(SLOTS)]
+            for s, busy_var in enumerate(busy[teacher]):
+                model.AddExactlyOne([variables[base + s] for base in bases] + [busy_var.Not()])
+
+    # Daily load caps
+    for teacher, row in busy.items():
+        cap = _setting_for(teacher_max_per_day, teacher)
+        if cap is not None and cap < periods_per_day:
+            for day in range(days_per_week):
+                model.Add(cp_model.LinearExpr.Sum(row[day * periods_per_day:(day + 1) * periods_per_day]) <= cap)
+
+    # Symmetry breaking: in a group of interchangeable classes, each class
+    # has its first period of the group's pivot subject before the next
+    # class does. Their pivot periods never share a slot (one teacher), so
+    # every timetable has exactly one permutation that satisfies this
+    symmetric_classes = equivalent_classes(classes, teachers, option_blocks)
+    symmetry_pivots = []
+    if break_symmetry:
+        for group in symmetric_classes:
+            pivot = max(classes[group[0]]["subjects"], key=lambda subject: subjects[subject])
+            symmetry_pivots.append(pivot)
+            pivot_bases = [offsets[i][classes[i]["subjects"].index(pivot)] for i in group]
+            for base, next_base in zip(pivot_bases, pivot_bases[1:]):
+                model.Add(variables[next_base] == 0)
+                # seen[s]: the earlier class has a pivot period before slot s
+                seen = variables[base]
+                for s in range(1, SLOTS):
+                    model.AddImplication(variables[next_base + s], seen)
+                    if s < SLOTS - 1:
+                        next_seen = new_bool("")
+                        model.AddBoolOr([next_seen.Not(), seen, variables[base + s]])
+                        seen = next_seen
+
+    # Teacher unavailability: one conjunction per teacher
+    for teacher, slots in (teacher_unavailable or {}).items():
+        bases = teacher_bases.get(teacher)
+        if bases and slots:
+            model.AddBoolAnd([variables[base + s].Not() for base in bases for s in slots])
+
+    # Penalty for teacher idle periods inside a day. before[p] (after[p]):
+    # the teacher teaches earlier (later) that day, chained period by
+    # period, so the encoding is linear in teachers x slots
+    gap_penalties = []
+    if teacher_gap_weight:
+        for teacher, row in busy.items():
+            for day in range(days_per_week):
+                day_busy = row[day * periods_per_day:(day + 1) * periods_per_day]
+                before = [None] + [new_bool("") for _ in range(periods_per_day - 1)]
+                after = [new_bool("") for _ in range(periods_per_day - 1)] + [None]
+                for p in range(1, periods_per_day):
+                    model.AddImplication(day_busy[p - 1], before[p])
+                    if p > 1:
+                        model.AddImplication(before[p - 1], before[p])
+                for p in range(periods_per_day - 2, -1, -1):
+                    model.AddImplication(day_busy[p + 1], after[p])
+                    if p < periods_per_day - 2:
+                        model.AddImplication(after[p + 1], after[p])
+                for p in range(1, periods_per_day - 1):
+                    gap = new_bool(f"penalty_gap_{teacher}_day{day}_period{p}" if names else "")
+                    model.AddBoolOr([before[p].Not(), after[p].Not(), day_busy[p], gap])
+                    gap_penalties.append(gap)
+
+    # Weighted objective
+    if sharded:
+        # The shards' penalties are in already; add the option blocks' and the gaps
+        objective = model.Proto().objective
+        for weight, penalties in [(consecutive_weight, consecutive_penalties), (repeat_weight, other_penalties),
+                                  (teacher_gap_weight, gap_penalties)]:
+            objective.vars.extend([penalty.Index() for penalty in penalties])
+            objective.coeffs.extend([weight] * len(penalties))
+    else:
+        model.Minimize(
+            consecutive_weight * cp_model.LinearExpr.Sum(consecutive_penalties)
+            + repeat_weight * cp_model.LinearExpr.Sum(other_penalties)
+            + teacher_gap_weight * cp_model.LinearExpr.Sum(gap_penalties)
+        )
+
+    built = {
+        "status": "built",
+        "model": model,
+        "variables": variables,
+        "offsets": offsets,
+        "teacher_bases": dict(teacher_bases),
+        "symmetric_classes": symmetric_classes,
+        "symmetry_pivots": symmetry_pivots,
+        "option_blocks": option_blocks,
+        "blocks": blocks,
+        "classes": classes,
+        "periods_per_day": periods_per_day,
+        "days_per_week": days_per_week,
+        "slots": SLOTS
+    }
+    if not lean:
+        # schedule[class][subject][slot], for callers that look variables up by name
+        built["schedule"] = {
+            c["class"]: {subject: variables[base:base + SLOTS] for subject, base in zip(c["subjects"], class_offsets)}
+            for c, class_offsets in zip(classes, offsets)
+        }
+    return built
+
+
+def feasibility_errors(data, periods_per_day=8, days_per_week=DAYS):
+    """Cheap necessary conditions checked before building the model.
+
+    Expects structurally valid data (see instance_schema). Catches the
+    common overloads, such as a teacher with more periods than slots,
+    without a solve.
+    """
+    errors = []
+    slots = days_per_week * periods_per_day
+    periods = {s["Subject"]: s["Periods"] for s in data["subjects"]}
+    teachers = {t["Subject"].strip(): t["Teacher"] for t in data["teachers"]}
+
+    teacher_load = defaultdict(int)
+    for c in data["classes"]:
+        for subject in c["subjects"]:
+            teacher_load[teachers[subject]] += periods[subject]
+
+    # An option block's subjects are taught once for the whole cohort
+    block_load = defaultdict(int)
+    for b in data.get("option_blocks", []):
+        for subject in b["subjects"]:
+            teacher_load[teachers[subject]] += periods[subject]
+        for class_name in b["classes"]:
+            block_load[class_name] += max(periods[subject] for subject in b["subjects"])
+    for c in data["classes"]:
+        if c["class"] in block_load:
+            load = block_load[c["class"]] + sum(periods[subject] for subject in c["subjects"])
+            if load > slots:
+                errors.append(f"Class '{c['class']}' has {load} periods with its option blocks, but only {slots} slots are available.")
+
+    for teacher, load in teacher_load.items():
+        if load > slots:
+            errors.append(f"Teacher '{teacher}' has to teach {load} periods, but only {slots} slots are available.")
+    return errors
+
+
+def add_timetable_hint(built, timetable):
+    """Hint the model's schedule variables with a previously found timetable.
+
+    Timetables of interchangeable classes are swapped into the order the
+    symmetry breaking asks for, so a hint from elsewhere (e.g. the greedy
+    constructor) is not rejected for the order of its classes alone.
+    """
+    model = built["model"]
+    variables = built["variables"]
+    model.ClearHints()
+    timetable = dict(timetable)
+    names = [c["class"] for c in built["classes"]]
+    for group, pivot in zip(built.get("symmetric_classes", []), built.get("symmetry_pivots", [])):
+        def first_pivot(i):
+            cells = timetable[names[i]]
+            return next((s for s in range(built["slots"]) if pivot in cells[str(s)]), built["slots"])
+        ordered = [timetable[names[i]] for i in sorted(group, key=first_pivot)]
+        for i, cells in zip(group, ordered):
+            timetable[names[i]] = cells
+    for c, class_offsets in zip(built["classes"], built["offsets"]):
+        cells = timetable[c["class"]]
+        for subject, base in zip(c["subjects"], class_offsets):
+            for s in range(built["slots"]):
+                model.AddHint(variables[base + s], subject in cells[str(s)])
+    for b in built.get("option_blocks") or []:
+        cells = timetable[names[b["classes"][0]]]
+        for s in range(built["slots"]):
+            model.AddHint(variables[b["base"] + s], b["subjects"][0] in cells[str(s)])
+
+
+def solution_values(response):
+    """Variable values of a CpSolverResponse, indexable by proto index.
+
+    Read the whole vector once (solver.ResponseProto() or a callback's
+    Response()) instead of calling Value() per variable.
+    """
+    return list(response.solution)
+
+
+def idle_gaps(busy):
+    """Idle periods between the first and last busy period of each day.
+
+    busy is a boolean (rows, days, periods) array; returns (rows, days).
+    """
+    periods = busy.shape[2]
+    first = busy.argmax(axis=2)
+    last = periods - 1 - busy[:, :, ::-1].argmax(axis=2)
+    return np.where(busy.any(axis=2), last - first + 1 - busy.sum(axis=2), 0)
+
+
+def block_sizes(data):
+    """subject -> block size, for the subjects taught in block lessons"""
+    sizes = {}
+    for s in data.get("subjects", []):
+        size, count = s.get("BlockSize", 1), s.get("Blocks")
+        if size > 1 and (s["Periods"] // size if count is None else count):
+            sizes[s["Subject"]] = size
+    return sizes
+
+
+def block_pairs(taught, size):
+    """Back-to-back pairs inside the block lessons of one subject.
+
+    taught is a boolean (rows, days, periods) array of the subject's
+    periods; returns (rows, days). A single period never touches another
+    period of its subject, so every run of two or more is whole blocks,
+    each with size - 1 pairs the objective does not charge.
+    """
+    left = np.zeros_like(taught)
+    left[:, :, 1:] = taught[:, :, :-1]
+    right = np.zeros_like(taught)
+    right[:, :, :-1] = taught[:, :, 1:]
+    in_runs = (taught & (left | right)).sum(axis=2)
+    return in_runs // size * (size - 1)
+
+
+def extract_timetable(built, solution, solver_score):
+    """Turn a solution vector (see solution_values) into a success result."""
+    SLOTS = built["slots"]
+    slot_keys = [str(s) for s in range(SLOTS)]
+    solution = np.asarray(solution)
+    timetable = {}
+    # matrix[class, slot]: position of the subject in the class's list, -1 when free
+    matrix = np.full((len(built["classes"]), SLOTS), -1)
+
+    for i, class_offsets in enumerate(built["offsets"]):
+        taken = solution[np.add.outer(np.asarray(class_offsets, dtype=int), np.arange(SLOTS))]
+        subject_ids, slots = np.nonzero(taken)
+        matrix[i, slots] = subject_ids
+
+    # Option blocks: every class of the block has all of its subjects in its slots,
+    # coded after the class's own subjects
+    option_blocks = built.get("option_blocks") or []
+    width = max(len(class_offsets) for class_offsets in built["offsets"])
+    for k, b in enumerate(option_blocks):
+        taken = np.flatnonzero(solution[b["base"]:b["base"] + SLOTS])
+        matrix[np.ix_(b["classes"], taken)] = width + k
+
+    # Build timetable
+    padding = [None] * width
+    for i, c in enumerate(built["classes"]):
+        cells = [[subject] for subject in c["subjects"]]
+        cells += padding[len(cells):] + [b["subjects"] for b in option_blocks]
+        timetable[c["class"]] = dict(zip(slot_keys, (list(cells[j]) if j >= 0 else [] for j in matrix[i].tolist())))
+
+    # Count free periods and actual consecutive periods, all classes at once
+    free_periods = dict(zip((c["class"] for c in built["classes"]), (matrix < 0).sum(axis=1).tolist()))
+    actual_consecutives = int(((matrix[:, 1:] == matrix[:, :-1]) & (matrix[:, 1:] >= 0)).sum())
+    # Pairs inside a block lesson are not penalised, so they are not repeats
+    days_shape = (1, built["days_per_week"], built["periods_per_day"])
+    for subject, (size, _) in (built.get("blocks") or {}).items():
+        for i, c in enumerate(built["classes"]):
+            if subject in c["subjects"]:
+                taught = (matrix[i] == c["subjects"].index(subject)).reshape(days_shape)
+                actual_consecutives -= int(block_pairs(taught, size).sum())
+
+    result = {
+        "status": "success",
+        "timetable": timetable,
+        "free_periods": free_periods,
+        "consecutive_repeats": actual_consecutives,
+        "solver_score": solver_score,
+        "periods_per_day": built["periods_per_day"],
+        "days_per_week": built["days_per_week"],
+        "classes": [c["class"] for c in built["classes"]]
+    }
+
+    # Teacher idle gaps, from the lessons of each teacher in each slot
+    teacher_bases = built.get("teacher_bases")
+    if teacher_bases:
+        teachers = list(teacher_bases)
+        busy = np.array([
+            solution[np.add.outer(np.asarray(teacher_bases[teacher], dtype=int), np.arange(SLOTS))].any(axis=0)
+            for teacher in teachers
+        ])
+        gaps = idle_gaps(busy.reshape(len(teachers), built["days_per_week"], built["periods_per_day"]))
+        result["teacher_gaps"] = dict(zip(teachers, gaps.sum(axis=1).tolist()))
+        result["teacher_gap_stats"] = {
+            "total": int(gaps.sum()),
+            "teachers_with_gaps": int((gaps.sum(axis=1) > 0).sum()),
+            "max_per_day": int(gaps.max(initial=0))
+        }
+    return result
+
+
+def dump_model(built, parameters, path):
+    """Write the built model, solver parameters and variable mapping to a zip.
+
+    path may be a filename or a writable binary file object. The protos
+    are stored in text format, which the zip deflates well. The dump can
+    be re-solved offline with replay_model.py.
+    """
+    mapping = {
+        "periods_per_day": built["periods_per_day"],
+        "days_per_week": built["days_per_week"],
+        "slots": built["slots"],
+        "classes": [{"class": c["class"], "subjects": c["subjects"]} for c in built["classes"]],
+        # offsets[class_id][subject_id] + slot -> variable index in the model proto
+        "offsets": built["offsets"],
+        "teacher_bases": built.get("teacher_bases"),
+        "option_blocks": built.get("option_blocks") or [],
+        "blocks": built.get("blocks") or {}
+    }
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as dump:
+        dump.writestr("model.pbtxt", str(built["model"].Proto()))
+        dump.writestr("parameters.pbtxt", str(parameters))
+        dump.writestr("mapping.json", json.dumps(mapping))
+
+
+def load_model_dump(path):
+    """Load a dump written by dump_model.
+
+    Returns (built, parameters): a built model dict usable with
+    extract_timetable, and the solver parameters of the original solve in
+    text format.
+    """
+    with zipfile.ZipFile(path) as dump:
+        model_text = dump.read("model.pbtxt").decode()
+        parameters = dump.read("parameters.pbtxt").decode()
+        mapping = json.loads(dump.read("mapping.json"))
+
+    model = cp_model.CpModel()
+    model.Proto().parse_text_format(model_text)
+
+    classes = mapping["classes"]
+    offsets = mapping["offsets"]
+    option_blocks = mapping.get("option_blocks", [])
+    bases = [base for class_offsets in offsets for base in class_offsets] + [b["base"] for b in option_blocks]
+    slot_count = max(bases) + mapping["slots"]
+    built = {
+        "status": "built",
+        "model": model,
+        "variables": [model.GetBoolVarFromProtoIndex(index) for index in range(slot_count)],
+        "offsets": offsets,
+        "teacher_bases": mapping.get("teacher_bases"),
+        "option_blocks": option_blocks,
+        "blocks": mapping.get("blocks", {}),
+        "classes": classes,
+        "periods_per_day": mapping["periods_per_day"],
+        "days_per_week": mapping.get("days_per_week", DAYS),
+        "slots": mapping["slots"]
+    }
+    return built, parameters
+
+
+def instance_size(data, periods_per_day=8, days_per_week=DAYS):
+    """Slot variables of an instance: class subjects x slots"""
+    return sum(len(c["subjects"]) for c in data.get("classes", [])) * periods_per_day * days_per_week
+
+
+_profile_cache = {}
+
+
+def _read_solver_profiles(path):
+    with open(path) as f:
+        buckets = json.load(f)["buckets"]
+    for bucket in buckets:
+        if not apply_solver_parameters(cp_model.CpSolver().parameters, bucket["parameters"]):
+            raise ValueError(f"unknown CP-SAT parameters in {bucket['parameters']}")
+    return sorted(buckets, key=lambda b: float("inf") if b["max_size"] is None else float(b["max_size"]))
+
+
+def load_solver_profiles(path=None):
+    """The size buckets of a profiles file, smallest first; [] if there is none.
+
+    A file that is not valid profiles is ignored with a warning, so
+    solves keep CP-SAT's defaults.
+    """
+    path = path or SOLVER_PROFILES
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return []
+    if _profile_cache.get(path, (None,))[0] != mtime:
+        try:
+            buckets = _read_solver_profiles(path)
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+            warnings.warn(f"Ignoring solver profiles {path}: {e!r}")
+            buckets = []
+        _profile_cache[path] = (mtime, buckets)
+    return _profile_cache[path][1]
+
+
+def solver_profile_for(size, buckets):
+    """The bucket covering an instance size, or None"""
+    for bucket in buckets:
+        if bucket["max_size"] is None or size <= bucket["max_size"]:
+            return bucket
+    return None
+
+
+def apply_solver_parameters(parameters, settings):
+    """Set {name: value} CP-SAT parameters; enum values are given by name.
+
+    Returns False if CP-SAT does not understand a name or value.
+    """
+    lines = [f"{name}: {str(value).lower() if isinstance(value, bool) else value}" for name, value in settings.items()]
+    return parameters.merge_text_format("\n".join(lines))
+
+
+def _profile_parameters(solver_profile, data, periods_per_day, days_per_week):
+    """Parameters of solver_profile: "auto" looks the instance's size up in SOLVER_PROFILES"""
+    if solver_profile == "auto":
+        bucket = solver_profile_for(instance_size(data, periods_per_day, days_per_week), load_solver_profiles())
+        return bucket["parameters"] if bucket else {}
+    return solver_profile or {}
+
+
+class SolveStop:
+    """A stop flag like threading.Event that also interrupts the solve in progress.
+
+    Pass it as stop_event; set() stops the CpSolver that is running (or
+    about to run) from any thread instead of waiting for its time limit.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._set = False
+        self._solver = None
+
+    def is_set(self):
+        return self._set
+
+    def set(self):
+        with self._lock:
+            self._set = True
+            if self._solver is not None:
+                # StopSearch is lost if Solve has not started yet; the zero time limit is not
+                self._solver.parameters.max_time_in_seconds = 0
+                self._solver.StopSearch()
+
+    def solve(self, solver, model, callback=None):
+        """solver.Solve(model, callback), unless set() has been called"""
+        with self._lock:
+            if self._set:
+                return cp_model.UNKNOWN
+            self._solver = solver
+        try:
+            return solver.Solve(model, callback)
+        finally:
+            with self._lock:
+                self._solver = None
+
+
+def _solve(solver, model, stop_event=None, callback=None):
+    """Solve model, stoppable while it runs if stop_event is a SolveStop"""
+    if isinstance(stop_event, SolveStop):
+        return stop_event.solve(solver, model, callback)
+    return solver.Solve(model, callback)
+
+
+def solve_timetable(data, periods_per_day=8, time_limit=None, num_workers=None, dump_path=None,
+                    hint=None, solver_profile="auto", stop_event=None, **model_options):
+    """Build and solve the model of data; see build_timetable_model for model_options.
+
+    solver_profile "auto" applies the tuned parameters (tune_solver.py)
+    of the instance's size bucket, if there are any; a {name: value}
+    dict applies those parameters and None keeps CP-SAT's defaults.
+    time_limit and num_workers override the profile. Setting stop_event
+    (a SolveStop) ends the solve early.
+    """
+    built = build_timetable_model(data, periods_per_day, **model_options)
+    if built["status"] == "fail":
+        return built
+    if hint is not None:
+        # Start from a previous timetable of the same classes
+        add_timetable_hint(built, hint)
+
+    # Solve
+    solver = cp_model.CpSolver()
+    profile = _profile_parameters(solver_profile, data, periods_per_day, built["days_per_week"])
+    apply_solver_parameters(solver.parameters, profile)
+    if time_limit is not None:
+        solver.parameters.max_time_in_seconds = time_limit
+    if num_workers is not None:
+        solver.parameters.num_workers = num_workers
+    if dump_path is not None:
+        dump_model(built, solver.parameters, dump_path)
+    status = _solve(solver, built["model"], stop_event)
+
+    if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
+        result = extract_timetable(built, solution_values(solver.ResponseProto()), solver.ObjectiveValue())
+    else:
+        result = {"status": "fail", "message": "No feasible solution. Try adjusting the constraints."}
+        # INFEASIBLE (proven) or UNKNOWN (time limit reached first)
+        result["solver_status"] = solver.StatusName(status)
+    if profile:
+        result["solver_parameters"] = profile
+    if "model_stats" in built:
+        result["model_stats"] = built["model_stats"]
+    return result
+
+
+class _StageCallback(cp_model.CpSolverSolutionCallback):
+    """Reports every improving solution of an optimization stage."""
+
+    def __init__(self, built, stage, on_result, stop_event):
+        super().__init__()
+        self.built = built
+        self.stage = stage
+        self.on_result = on_result
+        self.stop_event = stop_event
+        self.best = None
+
+    def on_solution_callback(self):
+        result = extract_timetable(self.built, solution_values(self.Response()), self.ObjectiveValue())
+        result["stage"] = self.stage
+        result["best_bound"] = self.BestObjectiveBound()
+        result["optimal"] = False
+        self.best = result
+        if self.on_result is not None:
+            self.on_result(result)
+        if self.stop_event is not None and self.stop_event.is_set():
+            self.StopSearch()
+
+
+def solve_timetable_staged(data, periods_per_day=8, first_stage_time=1.0,
+                           stage_time_limits=(10.0, 60.0), on_result=None, stop_event=None,
+                           num_workers=None, solver_profile="auto", **model_options):
+    """Anytime solve: a fast hard-constraints-only stage, then optimization stages.
+
+    Stage 0 ignores the penalties and stops after first_stage_time seconds.
+    Each later stage re-solves the full objective for its time limit, hinted
+    with the best timetable so far, until one proves optimality. on_result
+    is called with every timetable found; setting stop_event ends the run
+    early, within the current stage unless it is a SolveStop. num_workers
+    caps the solver threads of every stage, and every stage uses
+    solver_profile as solve_timetable does. Returns the best result.
+    """
+    built = build_timetable_model(data, periods_per_day, **model_options)
+    if built["status"] == "fail":
+        return built
+    profile = _profile_parameters(solver_profile, data, periods_per_day, built["days_per_week"])
+
+    # Stage 0: hard constraints only
+    feasibility_model = built["model"].Clone()
+    feasibility_model.ClearObjective()
+    solver = cp_model.CpSolver()
+    apply_solver_parameters(solver.parameters, profile)
+    solver.parameters.max_time_in_seconds = first_stage_time
+    if num_workers is not None:
+        solver.parameters.num_workers = num_workers
+    status = _solve(solver, feasibility_model, stop_event)
+
+    if status == cp_model.INFEASIBLE:
+        return {"status": "fail", "message": "No feasible solution. Try adjusting the constraints."}
+
+    best = None
+    if status == cp_model.FEASIBLE or status == cp_model.OPTIMAL:
+        # The penalties are unconstrained in this stage, so it has no score
+        best = extract_timetable(built, solution_values(solver.ResponseProto()), None)
+        best["stage"] = 0
+        best["best_bound"] = None
+        best["optimal"] = False
+        if on_result is not None:
+            on_result(best)
+
+    # Later stages: optimize the penalties starting from the best timetable
+    for stage, limit in enumerate(stage_time_limits, start=1):
+        if stop_event is not None and stop_event.is_set():
+            break
+        if best is not None:
+            add_timetable_hint(built, best["timetable"])
+
+        solver = cp_model.CpSolver()
+        apply_solver_parameters(solver.parameters, profile)
+        solver.parameters.max_time_in_seconds = limit
+        if num_workers is not None:
+            solver.parameters.num_workers = num_workers
+        callback = _StageCallback(built, stage, on_result, stop_event)
+        status = _solve(solver, built["model"], stop_event, callback)
+
+        if status == cp_model.INFEASIBLE:
+            return {"status": "fail", "message": "No feasible solution. Try adjusting the constraints."}
+        if callback.best is not None:
+            best = callback.best
+        if best is not None and (callback.best is not None or status == cp_model.OPTIMAL):
+            # Publish the final bound in a new dict; consumers already hold the callback's
+            best = dict(best, best_bound=solver.BestObjectiveBound(), optimal=status == cp_model.OPTIMAL)
+            if on_result is not None:
+                on_result(best)
+        if status == cp_model.OPTIMAL:
+            break
+
+    if best is None:
+        return {"status": "fail", "message": "No feasible solution found within the time limits."}
+    return best
+
+
+class StagedSolve:
+    """Runs solve_timetable_staged in a background thread.
+
+    latest holds the best result so far; the UI polls it and swaps the
+    timetable in as it improves.
+    """
+
+    def __init__(self, data, periods_per_day=8, **kwargs):
+        self.latest = None
+        self.done = False
+        self._first = threading.Event()
+        self._stop = SolveStop()
+        self._thread = threading.Thread(
+            target=self._run, args=(data, periods_per_day), kwargs=kwargs, daemon=True
+        )
+        self._thread.start()
+
+    def _record(self, result):
+        self.latest = result
+        self._first.set()
+
+    def _run(self, data, periods_per_day, **kwargs):
+        try:
+            result = solve_timetable_staged(
+                data, periods_per_day, on_result=self._record, stop_event=self._stop, **kwargs
+            )
+            if result["status"] == "fail" or self.latest is None:
+                self.latest = result
+        finally:
+            self.done = True
+            self._first.set()
+
+    def wait_first(self, timeout=None):
+        """Block until the first timetable (or a failure) is available."""
+        self._first.wait(timeout)
+        return self.latest
+
+    def cancel(self):
+        """Stop the solve, including the stage that is running"""
+        self._stop.set()
@@ -0,0 +1,153 @@
+import argparse
+import json
+import os
+import random
+import time
+
+from ortools.sat.python import cp_model
+
+from instance_schema import validate_instance
+from timetable_solver import DAYS, SOLVER_PROFILES, apply_solver_parameters, build_timetable_model, instance_size
+
+# Upper bounds of the size buckets, in slot variables (class subjects x
+# slots); the last bucket takes everything bigger. The 22-class
+# test_jsons schools are about 3200
+SIZE_BUCKETS = [5000, 25000, 100000, None]
+
+# CP-SAT parameters the tuner varies. num_workers is capped at the CPU count
+SEARCH_SPACE = {
+    "num_workers": [1, 2, 4, 8, 16],
+    "linearization_level": [0, 1, 2],
+    "search_branching": ["AUTOMATIC_SEARCH", "FIXED_SEARCH", "PORTFOLIO_SEARCH", "PSEUDO_COST_SEARCH"],
+    "cp_model_probing_level": [0, 1, 2],
+    "max_presolve_iterations": [1, 3],
+    "symmetry_level": [0, 2],
+}
+
+
+def bucket_of(size):
+    """Index of the SIZE_BUCKETS bucket a size falls in"""
+    for i, bound in enumerate(SIZE_BUCKETS):
+        if bound is None or size <= bound:
+            return i
+
+
+def sample_configs(count, cpus, seed=0):
+    """CP-SAT's defaults, then up to count - 1 distinct random configurations"""
+    rng = random.Random(seed)
+    space = dict(SEARCH_SPACE)
+    space["num_workers"] = sorted({min(n, cpus) for n in space["num_workers"]})
+    configs = [{}]
+    seen = set()
+    for _ in range(count * 20):
+        if len(configs) >= count:
+            break
+        config = {name: rng.choice(values) for name, values in space.items()}
+        key = tuple(sorted(config.items()))
+        if key not in seen:
+            seen.add(key)
+            configs.append(config)
+    return configs
+
+
+def run_trial(model, config, time_limit):
+    """Solve model once with config; returns the status, objective, bound, seconds and CPU seconds used"""
+    solver = cp_model.CpSolver()
+    apply_solver_parameters(solver.parameters, config)
+    solver.parameters.max_time_in_seconds = time_limit
+    start = time.perf_counter()
+    status = solver.Solve(model)
+    seconds = time.perf_counter() - start
+    found = status in (cp_model.OPTIMAL, cp_model.FEASIBLE)
+    return {
+        "status": solver.StatusName(status),
+        "objective": solver.ObjectiveValue() if found else None,
+        "bound": solver.BestObjectiveBound() if found else None,
+        "seconds": seconds,
+        "cpu_seconds": seconds * config.get("num_workers", os.cpu_count() or 1),
+    }
+
+
+def trial_cost(trial, time_limit):
+    """Lower is better: the solve time when proven optimal (or infeasible), else the time limit scaled by the gap left"""
+    if trial["status"] in ("OPTIMAL", "INFEASIBLE"):
+        return trial["seconds"]
+    if trial["objective"] is not None:
+        gap = (trial["objective"] - trial["bound"]) / max(1.0, abs(trial["objective"]))
+        return time_limit * (1 + min(gap, 1.0))
+    return time_limit * 3
+
+
+def tune(instances, cpu_budget=600.0, time_limit=10.0, configs=20, seed=0):
+    """Search CP-SAT configurations per size bucket within cpu_budget CPU seconds.
+
+    instances is a list of (data, periods_per_day). The budget is split
+    evenly over the buckets that have instances; in each, the
+    configurations are tried in turn (CP-SAT's defaults first) on all of
+    the bucket's instances until its share runs out. Returns the profiles
+    file content: {"buckets": [{"max_size", "parameters", "cost",
+    "default_cost", "instances", "trials"}]}, where cost is the mean
+    trial_cost of the chosen parameters.
+    """
+    cpus = os.cpu_count() or 1
+    by_bucket = {}
+    for data, periods_per_day in instances:
+        size = instance_size(data, periods_per_day, DAYS)
+        by_bucket.setdefault(bucket_of(size), []).append((data, periods_per_day))
+
+    buckets = []
+    share = cpu_budget / max(1, len(by_bucket))
+    for index in sorted(by_bucket):
+        members = by_bucket[index]
+        models = [build_timetable_model(data, periods_per_day, lean=True)["model"] for data, periods_per_day in members]
+        spent = 0.0
+        costs = []
+        for config in sample_configs(configs, cpus, seed):
+            # The defaults always get a trial, as the baseline
+            if costs and spent >= share:
+                break
+            trials = [run_trial(model, config, time_limit) for model in models]
+            spent += sum(trial["cpu_seconds"] for trial in trials)
+            costs.append((sum(trial_cost(trial, time_limit) for trial in trials) / len(trials), config))
+        cost, best = min(costs, key=lambda item: item[0])
+        buckets.append({
+            "max_size": SIZE_BUCKETS[index],
+            "parameters": best,
+            "cost": cost,
+            "default_cost": costs[0][0],
+            "instances": len(members),
+            "trials": len(costs),
+        })
+    return {"buckets": buckets}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tune CP-SAT parameters per instance size bucket.")
+    parser.add_argument("instances", nargs="+", help="Instance JSON files, e.g. data.json and test_jsons/*.json")
+    parser.add_argument("--periods", type=int, default=8, help="Periods per day")
+    parser.add_argument("--budget", type=float, default=600.0, help="CPU seconds for the whole search")
+    parser.add_argument("--time-limit", type=float, default=10.0, help="Seconds per trial solve")
+    parser.add_argument("--configs", type=int, default=20, help="Configurations to try per bucket, defaults included")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the configuration sample")
+    parser.add_argument("--output", default=SOLVER_PROFILES, help="Profiles file (solve_timetable reads the default one)")
+    args = parser.parse_args()
+
+    instances = []
+    for path in args.instances:
+        with open(path) as f:
+            data = json.load(f)
+        if validate_instance(data, args.periods, DAYS)[1]:
+            print(f"Skipping {path}: not a valid instance")
+            continue
+        instances.append((data, args.periods))
+
+    profiles = tune(instances, args.budget, args.time_limit, args.configs, args.seed)
+    for bucket in profiles["buckets"]:
+        bound = "rest" if bucket["max_size"] is None else f"<= {bucket['max_size']}"
+        print(
+            f"{bound:>10}: {bucket['instances']} instances, {bucket['trials']} configurations, "
+            f"cost {bucket['cost']:.2f} (defaults {bucket['default_cost']:.2f}) with {bucket['parameters'] or 'defaults'}"
+        )
+    with open(args.output, "w") as f:
+        json.dump(profiles, f, indent=2)
+    print(f"Profiles saved as {args.output}")
@@ -1,5 +1,12 @@
 import streamlit as st
+import hashlib
 import json
+import pandas as pd
+from instance_schema import validate_instance
+from solver_pool import pool_from_env
+from timetable_greedy import greedy_timetable
+from timetable_solver import feasibility_errors
+from timetable_query import TimetableIndex, DAY_NAMES
 
 # Initialize session state
 if 'step' not in st.session_state:
@@ -35,16 +42,17 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
-def validate_json(uploaded_file):
+def validate_json(raw):
+    """Parse the uploaded bytes once; returns (valid, message, data)"""
     try:
-        data = json.load(uploaded_file)
+        data = json.loads(raw)
         if not isinstance(data, (dict, list)):
-            return False, "JSON must be an object or array."
-        return True, "JSON is valid!"
+            return False, "JSON must be an object or array.", None
+        return True, "JSON is valid!", data
     except json.JSONDecodeError as e:
-        return False, f"Invalid JSON: {str(e)}"
+        return False, f"Invalid JSON: {str(e)}", None
     except Exception as e:
-        return False, f"Error reading JSON: {str(e)}"
+        return False, f"Error reading JSON: {str(e)}", None
 
 def next_step():
     st.session_state.step += 1
@@ -56,6 +64,128 @@ def prev_step():
     st.rerun()
 
 
+@st.cache_resource
+def get_solver_pool():
+    """One solver pool for every session of this server process"""
+    return pool_from_env()
+
+
+def speculative_key():
+    form_data = st.session_state.form_data
+    return (form_data.get('json_hash'), form_data.get('periods_per_day', 6), form_data.get('days_per_week', 5))
+
+
+def cancel_stale_speculation():
+    """Drop the background run if the inputs it was started with changed"""
+    run = st.session_state.get('speculative')
+    if run is not None and run['key'] != speculative_key():
+        if run['solve'] is not None:
+            run['solve'].cancel()
+        st.session_state.speculative = None
+
+
+def start_speculation():
+    """Validate the inputs and start solving them while the user reviews"""
+    cancel_stale_speculation()
+    if st.session_state.get('speculative') is None:
+        json_hash, periods_per_day, days_per_week = speculative_key()
+        data = st.session_state.form_data.get('json_data')
+        _, errors = validate_instance(data, periods_per_day, days_per_week)
+        errors = [str(error) for error in errors]
+        if not errors:
+            errors = feasibility_errors(data, periods_per_day, days_per_week)
+        solve = None
+        preview = None
+        if not errors:
+            solve = get_solver_pool().submit(
+                data, anytime=True, periods_per_day=periods_per_day, days_per_week=days_per_week
+            )
+            if not data.get('option_blocks'):
+                # A quick heuristic draft to show until the solver has something; the
+                # constructor does not support option blocks
+                preview = greedy_timetable(data, periods_per_day, days_per_week, time_limit=0.5)
+        st.session_state.speculative = {
+            'key': (json_hash, periods_per_day, days_per_week), 'errors': errors, 'solve': solve, 'preview': preview
+        }
+    return st.session_state.speculative
+
+
+def timetable_frame(result, class_name):
+    days = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+    periods_per_day = result['periods_per_day']
+    rows = []
+    for day_idx in range(result['days_per_week']):
+        row = {"Day": days[day_idx]}
+        for period in range(periods_per_day):
+            subjects = result['timetable'][class_name][str(day_idx * periods_per_day + period)]
+            row[f"Period {period + 1}"] = ", ".join(subjects) if subjects else "Free"
+        rows.append(row)
+    return pd.DataFrame(rows).set_index("Day")
+
+
+def timetable_index(result):
+    """The TimetableIndex of result, rebuilt only when the result object changes"""
+    cached = st.session_state.get('timetable_index')
+    if cached is None or cached[0] is not result:
+        cached = (result, TimetableIndex(result, st.session_state.form_data['json_data']))
+        st.session_state.timetable_index = cached
+    return cached[1]
+
+
+def show_speculative_result(solve, preview=None):
+    """Poll the background solve every 2 seconds while it runs, then show its final result"""
+    if solve.done:
+        speculative_view(solve, preview)
+    else:
+        poll_speculative_result(solve, preview)
+
+
+@st.fragment(run_every=2.0)
+def poll_speculative_result(solve, preview):
+    if solve.done:
+        # A full rerun shows the final result without the polling timer
+        st.rerun()
+    speculative_view(solve, preview)
+
+
+def speculative_view(solve, preview):
+    result = solve.latest
+    if preview is not None and preview['status'] != 'success':
+        preview = None
+    if result is None:
+        position = solve.position
+        if position:
+            st.info(f"⏳ Waiting for a free solver: position {position} in the queue.")
+        else:
+            st.info("⚙️ Generating timetable...")
+        if preview is None:
+            return
+        st.caption("📝 Quick draft from the greedy constructor, shown until the solver finds a timetable")
+        result = preview
+    elif result['status'] != 'success':
+        if preview is None:
+            st.error(result['message'])
+            return
+        st.warning("The solver found no timetable in time; showing the greedy constructor's draft.")
+        result = preview
+    elif not solve.done:
+        st.caption("⏳ Improving the timetable in the background...")
+    selected_class = st.selectbox("Class", result['classes'], key="result_class")
+    st.dataframe(timetable_frame(result, selected_class), use_container_width=True)
+
+    with st.expander("Who is free?"):
+        index = timetable_index(result)
+        col1, col2 = st.columns(2)
+        with col1:
+            day = st.selectbox("Day", DAY_NAMES[:index.days_per_week], key="free_day")
+        with col2:
+            period = st.selectbox("Period", range(1, index.periods_per_day + 1), key="free_period")
+        st.write(", ".join(index.free_teachers(index.slot(day, period))) or "No free teachers")
+
+
+cancel_stale_speculation()
+
+
 # Progress indicator: show 0% at step 1 and 100% at step 6
 progress_value = (st.session_state.step - 1) / 5
 st.progress(progress_value)
@@ -125,13 +255,22 @@ with st.container():
         )
         
         if uploaded_file is not None:
-            valid, message = validate_json(uploaded_file)
+            # Parse each upload once, keyed by its content hash
+            raw = uploaded_file.getvalue()
+            json_hash = hashlib.sha256(raw).hexdigest()
+            cached = st.session_state.get('upload_cache')
+            is_new_upload = cached is None or cached[0] != json_hash
+            if is_new_upload:
+                cached = (json_hash,) + validate_json(raw)
+                st.session_state.upload_cache = cached
+            _, valid, message, data = cached
             if valid:
                 st.success(message)
-                uploaded_file.seek(0)  # reset file pointer before reading again
-                st.session_state.form_data['json_data'] = json.load(uploaded_file)
-                # Auto-advance after successful upload
-                st.rerun()
+                st.session_state.form_data['json_data'] = data
+                st.session_state.form_data['json_hash'] = json_hash
+                # Auto-advance after a new successful upload
+                if is_new_upload:
+                    next_step()
             else:
                 st.error(message)
         
@@ -154,6 +293,18 @@ with st.container():
         if 'json_data' in st.session_state.form_data:
             with st.expander("View JSON Data"):
                 st.json(st.session_state.form_data['json_data'])
+
+            # Validate and solve speculatively while the user reviews
+            speculative = start_speculation()
+            if speculative['errors']:
+                for error in speculative['errors']:
+                    st.error(error)
+            elif speculative['solve'].latest is not None:
+                st.caption("✅ Inputs are valid, timetable is ready")
+            elif speculative['solve'].position:
+                st.caption(f"✅ Inputs are valid, queued for a solver (position {speculative['solve'].position})")
+            else:
+                st.caption("✅ Inputs are valid, generating timetable...")
         
         # Navigation and submit
         col1, col2, col3 = st.columns([1, 1, 1])
@@ -170,3 +321,11 @@ with st.container():
         if 'json_data' in st.session_state.form_data:
             with st.expander("View Uploaded JSON"):
                 st.json(st.session_state.form_data['json_data'])
+
+            speculative = start_speculation()
+            if speculative['errors']:
+                for error in speculative['errors']:
+                    st.error(error)
+            else:
+                # Waits for the solve without blocking the page while queued
+                show_speculative_result(speculative['solve'], speculative['preview'])